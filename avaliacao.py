@@ -0,0 +1,437 @@
+"""
+Avaliação de precisão x velocidade dos detectores
+Roda configurações de detectores sobre um conjunto de imagens anotadas
+
+Formato do conjunto (pasta com as imagens e um arquivo anotacoes.json):
+
+    {
+        "px_por_cm": 10.0,
+        "imagens": {
+            "img001.jpg": {
+                "pessoas": [[x, y, w, h], ...],
+                "cabecas": [[x, y, r], [x, y, r, diametro_cm], ...],
+                "px_por_cm": 9.5
+            }
+        }
+    }
+
+"px_por_cm" (global ou por imagem) converte os raios em cm; se a cabeça
+tiver o diâmetro real medido (4º valor), ele é usado como referência.
+
+Formato das configurações (lista JSON):
+
+    [
+        {"nome": "hog_padrao", "detector": "pessoas",
+         "parametros": {"min_confidence": 0.3}},
+        {"nome": "circulo_p2_25", "detector": "circulo",
+         "atributos": {"param2": 25}}
+    ]
+
+"atributos" são aplicados no objeto do detector (ex: param1, param2) e
+"parametros" são repassados para a função de detecção ("pessoas") ou para
+o construtor ("cabecas", ex: largura_processamento, metodo; "circulo", ex:
+usar_mascara_fundo para conjuntos que são sequências de uma câmera fixa).
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+ARQUIVO_ANOTACOES = 'anotacoes.json'
+
+# Limiares de IoU usados no mAP (estilo COCO: 0.50 a 0.95)
+LIMIARES_IOU = np.round(np.arange(0.5, 0.96, 0.05), 2)
+
+# Configurações usadas quando nenhum arquivo é informado
+CONFIGURACOES_PADRAO = [
+    {"nome": "hog_padrao", "detector": "pessoas", "parametros": {"min_confidence": 0.3}},
+    {"nome": "circulo_padrao", "detector": "circulo"},
+]
+
+
+def criar_detector_pessoas(config):
+    """Detector HOG de pessoas (detector_avancado.DetectorPessoa)"""
+    from detector_avancado import DetectorPessoa
+
+    detector = DetectorPessoa(camera_id=None)
+    aplicar_atributos(detector, config)
+    parametros = config.get('parametros', {})
+
+    def detectar(frame):
+        return [(x, y, w, h, valor_escalar(peso))
+                for x, y, w, h, peso in detector.detectar_pessoas(frame, **parametros)]
+
+    return detectar
+
+
+def criar_detector_circulo(config):
+    """Detector de círculo central (detector_circulos_centro.DetectorCirculoCentro)"""
+    from detector_circulos_centro import DetectorCirculoCentro
+
+    # Por padrão sem modelo de fundo: as imagens do conjunto não são uma sequência
+    parametros = dict(config.get('parametros', {}))
+    parametros.setdefault('usar_mascara_fundo', False)
+    detector = DetectorCirculoCentro(camera_id=None, **parametros)
+    aplicar_atributos(detector, config)
+
+    def detectar(frame):
+        circulo, _, _ = detector.detectar_circulo_central(frame)
+        if circulo is None:
+            return []
+        x, y, r = circulo
+        return [(x - r, y - r, 2 * r, 2 * r, 1.0)]
+
+    return detectar
+
+
+def criar_detector_cabecas(config):
+    """Detector de múltiplas cabeças (detector_cabecas.DetectorCabecas)"""
+    from detector_cabecas import DetectorCabecas
+
+    detector = DetectorCabecas(camera_id=None, **config.get('parametros', {}))
+    aplicar_atributos(detector, config)
+
+    def detectar(frame):
+        return [(x - r, y - r, 2 * r, 2 * r, score)
+                for x, y, r, score in detector.detectar_cabecas(frame)]
+
+    return detectar
+
+
+# Nome do detector -> (fábrica, tipo de anotação usada como referência)
+DETECTORES = {
+    'pessoas': (criar_detector_pessoas, 'pessoas'),
+    'circulo': (criar_detector_circulo, 'cabecas'),
+    'cabecas': (criar_detector_cabecas, 'cabecas'),
+}
+
+
+def aplicar_atributos(detector, config):
+    """Aplica os atributos da configuração no detector (ex: param2)"""
+    for nome, valor in config.get('atributos', {}).items():
+        if not hasattr(detector, nome):
+            raise ValueError(f"Atributo desconhecido '{nome}' na configuração {config['nome']}")
+        setattr(detector, nome, valor)
+
+
+def valor_escalar(valor):
+    """Converte pesos do OpenCV (float ou array de 1 elemento) em float"""
+    return float(np.asarray(valor, dtype=np.float64).ravel()[0])
+
+
+def circulos_para_caixas(circulos):
+    """Converte círculos (x, y, r, ...) em caixas (x, y, w, h)"""
+    return [(x - r, y - r, 2 * r, 2 * r) for x, y, r, *_ in circulos]
+
+
+def matriz_iou(caixas_a, caixas_b):
+    """
+    IoU entre todas as caixas (x, y, w, h) de A e de B
+
+    Returns:
+        Array (len(A), len(B))
+    """
+    a = np.asarray(caixas_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(caixas_b, dtype=np.float64).reshape(-1, 4)
+    ax2, ay2 = a[:, 0] + a[:, 2], a[:, 1] + a[:, 3]
+    bx2, by2 = b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax2[:, None], bx2[None]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    inter_h = np.clip(np.minimum(ay2[:, None], by2[None]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    intersecao = inter_w * inter_h
+    uniao = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None] - intersecao
+    return np.where(uniao > 0, intersecao / np.maximum(uniao, 1e-9), 0.0)
+
+
+def casar(iou, scores, limiar):
+    """
+    Casamento guloso por confiança (cada referência casa com no máximo uma predição)
+
+    Returns:
+        Array com o índice da referência casada para cada predição (-1 = falso positivo)
+    """
+    casamentos = np.full(iou.shape[0], -1, dtype=np.int64)
+    usadas = np.zeros(iou.shape[1], dtype=bool)
+    for i in np.argsort(-np.asarray(scores), kind='stable'):
+        if iou.shape[1] == 0:
+            break
+        candidatos = np.where(usadas, -1.0, iou[i])
+        j = int(np.argmax(candidatos))
+        if candidatos[j] >= limiar:
+            casamentos[i] = j
+            usadas[j] = True
+    return casamentos
+
+
+def precisao_media(scores, acertos, total_referencias):
+    """
+    Average Precision (área sob a curva precisão x revocação, todos os pontos)
+
+    Args:
+        scores: Confiança de cada predição (todas as imagens)
+        acertos: Se cada predição é verdadeiro positivo
+        total_referencias: Número de objetos anotados
+    """
+    if total_referencias == 0:
+        return float('nan')
+    if len(scores) == 0:
+        return 0.0
+
+    ordem = np.argsort(-np.asarray(scores), kind='stable')
+    acertos = np.asarray(acertos, dtype=bool)[ordem]
+    vp = np.cumsum(acertos)
+    fp = np.cumsum(~acertos)
+    revocacao = vp / total_referencias
+    precisao = vp / np.maximum(vp + fp, 1)
+
+    # Envelope da precisão (monotonicamente decrescente)
+    revocacao = np.concatenate(([0.0], revocacao, [1.0]))
+    precisao = np.concatenate(([0.0], precisao, [0.0]))
+    precisao = np.maximum.accumulate(precisao[::-1])[::-1]
+    passos = np.nonzero(revocacao[1:] != revocacao[:-1])[0]
+    return float(np.sum((revocacao[passos + 1] - revocacao[passos]) * precisao[passos + 1]))
+
+
+def carregar_conjunto(diretorio):
+    """Lê o arquivo de anotações do conjunto"""
+    caminho = os.path.join(diretorio, ARQUIVO_ANOTACOES)
+    if not os.path.exists(caminho):
+        raise ValueError(f"Arquivo {ARQUIVO_ANOTACOES} não encontrado em {diretorio}")
+    with open(caminho, 'r', encoding='utf-8') as f:
+        conjunto = json.load(f)
+    if not conjunto.get('imagens'):
+        raise ValueError(f"Nenhuma imagem anotada em {caminho}")
+    return conjunto
+
+
+def carregar_configuracoes(caminho):
+    """Lê a lista de configurações (ou usa as padrão)"""
+    if caminho is None:
+        return CONFIGURACOES_PADRAO
+    with open(caminho, 'r', encoding='utf-8') as f:
+        configuracoes = json.load(f)
+    if not isinstance(configuracoes, list) or not configuracoes:
+        raise ValueError(f"{caminho} deve conter uma lista de configurações")
+    nomes = set()
+    for i, config in enumerate(configuracoes, 1):
+        if not isinstance(config, dict):
+            raise ValueError(f"Configuração {i} de {caminho} não é um objeto JSON")
+        if not isinstance(config.get('nome'), str) or not config['nome']:
+            raise ValueError(f"Configuração {i} de {caminho} sem 'nome'")
+        if config['nome'] in nomes:
+            raise ValueError(f"Nome de configuração repetido em {caminho}: {config['nome']}")
+        nomes.add(config['nome'])
+        if not isinstance(config.get('parametros', {}), dict):
+            raise ValueError(f"'parametros' da configuração {config['nome']} deve ser um objeto")
+        if config.get('detector') not in DETECTORES:
+            raise ValueError(f"Detector desconhecido na configuração {config.get('nome')}: "
+                             f"{config.get('detector')} (use {', '.join(DETECTORES)})")
+    return configuracoes
+
+
+def ler_imagens(diretorio, conjunto):
+    """
+    Lê as imagens do conjunto uma a uma (só uma fica na memória por vez)
+
+    Yields:
+        Tupla (nome, frame, anotacao) de cada imagem legível
+    """
+    for nome, anotacao in sorted(conjunto['imagens'].items()):
+        frame = cv2.imread(os.path.join(diretorio, nome))
+        if frame is None:
+            print(f"AVISO: Não foi possível ler {nome}, ignorando")
+            continue
+        yield nome, frame, anotacao
+
+
+def avaliar(config, diretorio, conjunto, aquecimento=2):
+    """
+    Roda uma configuração sobre o conjunto e calcula as métricas
+
+    Args:
+        config: Dicionário da configuração
+        diretorio: Pasta das imagens
+        conjunto: Anotações carregadas
+        aquecimento: Frames processados antes de medir a latência
+
+    Returns:
+        Tupla (metricas, latencias_por_imagem)
+    """
+    fabrica, tipo_referencia = DETECTORES[config['detector']]
+    detectar = fabrica(config)
+    px_por_cm_global = conjunto.get('px_por_cm')
+
+    # As imagens são lidas sob demanda (a leitura fica fora da medição de
+    # latência), para não manter o conjunto inteiro na memória
+    for _, frame, _ in itertools.islice(ler_imagens(diretorio, conjunto), aquecimento):
+        detectar(frame)
+
+    scores = []
+    acertos = {limiar: [] for limiar in LIMIARES_IOU}
+    total_referencias = 0
+    latencias = []
+    erros_centro, erros_raio, erros_diametro_cm = [], [], []
+
+    for nome, frame, anotacao in ler_imagens(diretorio, conjunto):
+        inicio = time.perf_counter()
+        predicoes = detectar(frame)
+        latencias.append((nome, time.perf_counter() - inicio))
+
+        referencias = anotacao.get(tipo_referencia, [])
+        caixas_ref = circulos_para_caixas(referencias) if tipo_referencia == 'cabecas' else referencias
+        total_referencias += len(caixas_ref)
+
+        caixas_pred = [p[:4] for p in predicoes]
+        scores_pred = [p[4] for p in predicoes]
+        scores.extend(scores_pred)
+        iou = matriz_iou(caixas_pred, caixas_ref)
+        for limiar in LIMIARES_IOU:
+            acertos[limiar].extend(casar(iou, scores_pred, limiar) >= 0)
+
+        if tipo_referencia != 'cabecas':
+            continue
+
+        # Erros de centro/raio/diâmetro para os círculos casados em IoU 0.5
+        px_por_cm = anotacao.get('px_por_cm', px_por_cm_global)
+        for i, j in enumerate(casar(iou, scores_pred, 0.5)):
+            if j < 0:
+                continue
+            x, y, w, _ = caixas_pred[i]
+            r_pred = w / 2
+            x_ref, y_ref, r_ref, *diametro_ref = referencias[j]
+            erros_centro.append(np.hypot(x + r_pred - x_ref, y + r_pred - y_ref))
+            erros_raio.append(abs(r_pred - r_ref))
+            if px_por_cm:
+                diametro_ref_cm = diametro_ref[0] if diametro_ref else 2 * r_ref / px_por_cm
+                erros_diametro_cm.append(abs(2 * r_pred / px_por_cm - diametro_ref_cm))
+
+    if not latencias:
+        raise ValueError(f"Nenhuma imagem do conjunto pôde ser lida em {diretorio}")
+
+    tempos = np.array([t for _, t in latencias])
+    acertos_50 = np.asarray(acertos[0.5], dtype=bool)
+    vp = int(acertos_50.sum())
+
+    metricas = {
+        'nome': config['nome'],
+        'detector': config['detector'],
+        'imagens': len(latencias),
+        'referencias': total_referencias,
+        'predicoes': len(scores),
+        'precisao': vp / len(scores) if scores else 0.0,
+        'revocacao': vp / total_referencias if total_referencias else float('nan'),
+        'ap50': precisao_media(scores, acertos[0.5], total_referencias),
+        'map': float(np.mean([precisao_media(scores, acertos[limiar], total_referencias)
+                              for limiar in LIMIARES_IOU])),
+        'latencia_media_ms': float(tempos.mean() * 1000),
+        'latencia_p50_ms': float(np.percentile(tempos, 50) * 1000),
+        'latencia_p95_ms': float(np.percentile(tempos, 95) * 1000),
+        'fps': float(1.0 / tempos.mean()) if tempos.mean() > 0 else float('inf'),
+        'erro_centro_px': float(np.mean(erros_centro)) if erros_centro else float('nan'),
+        'erro_raio_px': float(np.mean(erros_raio)) if erros_raio else float('nan'),
+        'erro_diametro_cm': float(np.mean(erros_diametro_cm)) if erros_diametro_cm else float('nan'),
+    }
+    return metricas, latencias
+
+
+def desenhar_grafico(resultados, caminho, largura=900, altura=600):
+    """Gráfico de dispersão AP@0.5 x FPS (uma cor por tipo de detector)"""
+    margem = 70
+    imagem = np.full((altura, largura, 3), 255, dtype=np.uint8)
+    cv2.line(imagem, (margem, altura - margem), (largura - 20, altura - margem), (0, 0, 0), 1)
+    cv2.line(imagem, (margem, 20), (margem, altura - margem), (0, 0, 0), 1)
+
+    fps_max = max([r['fps'] for r in resultados if np.isfinite(r['fps'])] or [1.0]) * 1.1
+
+    def posicao(fps, ap):
+        px = margem + (min(fps, fps_max) / fps_max) * (largura - margem - 20)
+        py = altura - margem - ap * (altura - margem - 20)
+        return int(px), int(py)
+
+    # Grade e rótulos dos eixos
+    for i in range(6):
+        ap = i / 5
+        _, py = posicao(0, ap)
+        cv2.line(imagem, (margem, py), (largura - 20, py), (220, 220, 220), 1)
+        cv2.putText(imagem, f"{ap:.1f}", (margem - 40, py + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+        fps = fps_max * i / 5
+        px, _ = posicao(fps, 0)
+        cv2.putText(imagem, f"{fps:.0f}", (px - 10, altura - margem + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+    cv2.putText(imagem, "FPS", (largura // 2, altura - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 1)
+    cv2.putText(imagem, "AP@0.5", (5, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 1)
+
+    cores = [(200, 0, 0), (0, 150, 0), (0, 0, 200), (0, 140, 255), (150, 0, 150)]
+    tipos = sorted({r['detector'] for r in resultados})
+    for r in resultados:
+        ap = r['ap50'] if np.isfinite(r['ap50']) else 0.0
+        ponto = posicao(r['fps'] if np.isfinite(r['fps']) else fps_max, ap)
+        cor = cores[tipos.index(r['detector']) % len(cores)]
+        cv2.circle(imagem, ponto, 6, cor, -1)
+        cv2.putText(imagem, r['nome'], (ponto[0] + 8, ponto[1] - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.45, cor, 1)
+
+    cv2.imwrite(caminho, imagem)
+
+
+def salvar_relatorio(resultados, latencias, diretorio_saida):
+    """Grava relatorio.json, relatorio.csv, latencias.csv e grafico.png"""
+    os.makedirs(diretorio_saida, exist_ok=True)
+
+    with open(os.path.join(diretorio_saida, 'relatorio.json'), 'w', encoding='utf-8') as f:
+        # NaN (métrica sem referência) vira null para manter o JSON válido
+        sem_nan = [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in r.items()}
+                   for r in resultados]
+        json.dump(sem_nan, f, indent=2, ensure_ascii=False)
+
+    with open(os.path.join(diretorio_saida, 'relatorio.csv'), 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=list(resultados[0]))
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+    with open(os.path.join(diretorio_saida, 'latencias.csv'), 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['configuracao', 'imagem', 'latencia_ms'])
+        for nome_config, tempos in latencias.items():
+            for imagem, tempo in tempos:
+                escritor.writerow([nome_config, imagem, f"{tempo * 1000:.3f}"])
+
+    desenhar_grafico(resultados, os.path.join(diretorio_saida, 'grafico.png'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avaliação de precisão x velocidade dos detectores")
+    parser.add_argument("conjunto", help=f"Pasta com as imagens e o {ARQUIVO_ANOTACOES}")
+    parser.add_argument("--configuracoes", help="Arquivo JSON com a lista de configurações")
+    parser.add_argument("--saida", default="avaliacao", help="Pasta dos relatórios (padrão: avaliacao)")
+    args = parser.parse_args()
+
+    try:
+        conjunto = carregar_conjunto(args.conjunto)
+        configuracoes = carregar_configuracoes(args.configuracoes)
+        resultados, latencias = [], {}
+        for config in configuracoes:
+            print(f"Avaliando {config['nome']}...")
+            metricas, latencias[config['nome']] = avaliar(config, args.conjunto, conjunto)
+            resultados.append(metricas)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+
+    print(f"\n{'Configuração':<24}{'Precisão':>10}{'Revocação':>11}{'AP50':>8}{'mAP':>8}"
+          f"{'FPS':>8}{'Erro diâm. (cm)':>17}")
+    for r in resultados:
+        print(f"{r['nome']:<24}{r['precisao']:>10.3f}{r['revocacao']:>11.3f}{r['ap50']:>8.3f}"
+              f"{r['map']:>8.3f}{r['fps']:>8.1f}{r['erro_diametro_cm']:>17.2f}")
+
+    salvar_relatorio(resultados, latencias, args.saida)
+    print(f"\nRelatórios salvos em: {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
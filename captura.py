@@ -0,0 +1,280 @@
+"""
+Camada de captura de baixa latência para webcams UVC
+Negocia MJPG, reduz o buffer do driver e descarta frames atrasados
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+# Texto usado quando o backend não informa o FOURCC (get() retorna 0)
+FOURCC_DESCONHECIDO = "????"
+
+
+def fourcc_para_texto(valor):
+    """Converte o código FOURCC numérico retornado pelo OpenCV em texto (ex: 'MJPG')"""
+    valor = int(valor)
+    if valor <= 0:
+        return FOURCC_DESCONHECIDO
+    return "".join(chr((valor >> (8 * i)) & 0xFF) for i in range(4))
+
+
+class CapturaBaixaLatencia:
+    def __init__(self, fonte=0, largura=1280, altura=720, fps=30,
+                 formato="MJPG", tamanho_buffer=1, max_descartes=4,
+                 limiar_descarte_ms=None, descartar_atrasados=True):
+        """
+        Abre a câmera e negocia um modo de captura de baixa latência
+
+        Args:
+            fonte: ID da câmera, caminho/URL de vídeo ou um objeto com a mesma
+                   interface de cv2.VideoCapture (útil para testes com fonte falsa)
+            largura: Largura desejada do frame
+            altura: Altura desejada do frame
+            fps: FPS desejado
+            formato: FOURCC preferido ('MJPG'); None mantém o padrão do driver
+            tamanho_buffer: Valor para CAP_PROP_BUFFERSIZE (nem todo backend suporta)
+            max_descartes: Máximo de frames antigos descartados a cada leitura
+            limiar_descarte_ms: Um grab() mais rápido que este limiar indica que o
+                                frame já estava na fila do driver (frame antigo).
+                                Padrão: metade do intervalo entre frames
+            descartar_atrasados: Se False, lê todos os frames em sequência
+                                 (use False para arquivos de vídeo)
+        """
+        if isinstance(fonte, (int, str)):
+            self.cap = cv2.VideoCapture(fonte)
+        else:
+            self.cap = fonte
+
+        if not self.cap.isOpened():
+            raise ValueError(f"Não foi possível abrir a câmera {fonte}")
+
+        # A ordem importa em vários drivers: o FOURCC deve ser definido antes
+        # da resolução, senão o driver escolhe o modo com o formato antigo
+        if formato:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*formato))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, largura)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, altura)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if tamanho_buffer:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, tamanho_buffer)
+
+        self.max_descartes = max_descartes if descartar_atrasados else 0
+        if limiar_descarte_ms is None:
+            limiar_descarte_ms = 500.0 / fps if fps else 10.0
+        self.limiar_descarte = limiar_descarte_ms / 1000.0
+
+        # Estatísticas
+        self.frames_lidos = 0
+        self.frames_descartados = 0
+        self.ultimo_timestamp = None
+        self.fps_medido = 0.0
+        self._frames_janela = 0
+        self._inicio_janela = time.perf_counter()
+
+        self.formato_pedido = formato
+        self.modo = self.consultar_modo()
+
+    def consultar_modo(self):
+        """
+        Lê do driver o modo efetivamente negociado
+
+        Returns:
+            Dicionário com formato (FOURCC), largura, altura, fps e buffer
+        """
+        return {
+            'formato': fourcc_para_texto(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            'largura': int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'altura': int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': float(self.cap.get(cv2.CAP_PROP_FPS)),
+            'buffer': int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        }
+
+    def descrever_modo(self):
+        """Texto curto com o modo negociado (para imprimir no início)"""
+        modo = self.modo
+        texto = (f"{modo['largura']}x{modo['altura']} {modo['formato']} "
+                 f"@ {modo['fps']:.1f} FPS (buffer: {modo['buffer']})")
+        if modo['formato'] == FOURCC_DESCONHECIDO:
+            # Vários backends não informam o FOURCC: não dá para saber se a negociação falhou
+            if self.formato_pedido:
+                texto += f" - formato não informado pelo driver ({self.formato_pedido} não confirmado)"
+        elif self.formato_pedido and modo['formato'] != self.formato_pedido:
+            texto += f" - AVISO: {self.formato_pedido} não suportado pela câmera"
+        return texto
+
+    def read(self):
+        """
+        Lê o frame mais recente
+
+        Usa grab()/retrieve(): os frames que já estavam na fila do driver
+        (grab() retorna imediatamente) são descartados sem decodificar, e
+        somente o último é decodificado com retrieve().
+
+        Returns:
+            Tupla (ret, frame), compatível com cv2.VideoCapture.read()
+        """
+        inicio = time.perf_counter()
+        if not self.cap.grab():
+            return False, None
+        duracao = time.perf_counter() - inicio
+
+        descartes = 0
+        while duracao < self.limiar_descarte and descartes < self.max_descartes:
+            inicio = time.perf_counter()
+            if not self.cap.grab():
+                break
+            duracao = time.perf_counter() - inicio
+            descartes += 1
+
+        ret, frame = self.cap.retrieve()
+        if ret:
+            self.frames_lidos += 1
+            self.frames_descartados += descartes
+            self.ultimo_timestamp = time.time()
+            self._atualizar_fps()
+        return ret, frame
+
+    def _atualizar_fps(self):
+        """Atualiza o FPS efetivamente entregue (janela de 1 segundo)"""
+        self._frames_janela += 1
+        agora = time.perf_counter()
+        decorrido = agora - self._inicio_janela
+        if decorrido > 1.0:
+            self.fps_medido = self._frames_janela / decorrido
+            self._frames_janela = 0
+            self._inicio_janela = agora
+
+    def isOpened(self):
+        """Mantém compatibilidade com cv2.VideoCapture"""
+        return self.cap.isOpened()
+
+    def get(self, propriedade):
+        """Repassa consultas de propriedades para a captura original"""
+        return self.cap.get(propriedade)
+
+    def set(self, propriedade, valor):
+        """Repassa ajustes de propriedades e atualiza o modo negociado"""
+        resultado = self.cap.set(propriedade, valor)
+        self.modo = self.consultar_modo()
+        return resultado
+
+    def release(self):
+        """Libera a câmera"""
+        self.cap.release()
+
+
+class FonteFalsa:
+    """
+    Fonte com a interface de cv2.VideoCapture para verificar o descarte
+
+    Simula um driver com frames_na_fila frames já prontos (grab() imediato);
+    depois deles, cada grab() espera um novo frame por intervalo segundos.
+    Cada frame é preenchido com o seu número de sequência.
+    """
+
+    def __init__(self, frames_na_fila=5, intervalo=0.02):
+        self.frames_na_fila = frames_na_fila
+        self.intervalo = intervalo
+        self.propriedades = {}
+        self.sequencia = 0
+
+    def isOpened(self):
+        return True
+
+    def set(self, propriedade, valor):
+        # FOURCC não é guardado: simula um backend que não o informa
+        if propriedade != cv2.CAP_PROP_FOURCC:
+            self.propriedades[propriedade] = valor
+        return True
+
+    def get(self, propriedade):
+        return self.propriedades.get(propriedade, 0)
+
+    def grab(self):
+        if self.frames_na_fila > 0:
+            self.frames_na_fila -= 1
+        else:
+            time.sleep(self.intervalo)
+        self.sequencia += 1
+        return True
+
+    def retrieve(self):
+        return True, np.full((4, 4, 3), self.sequencia, dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def verificar_descarte():
+    """
+    Verifica a lógica de descarte contra uma FonteFalsa
+
+    Returns:
+        True se todas as verificações passaram
+    """
+    falhas = []
+
+    # Com descarte: 5 frames na fila e max_descartes=4 -> entrega o 5º (o mais novo)
+    captura = CapturaBaixaLatencia(FonteFalsa(frames_na_fila=5), max_descartes=4)
+    ret, frame = captura.read()
+    if not ret or frame[0, 0, 0] != 5 or captura.frames_descartados != 4:
+        falhas.append(f"descarte: frame {frame[0, 0, 0] if ret else None}, "
+                      f"descartados {captura.frames_descartados} (esperado 5 e 4)")
+
+    # Sem descarte: todos os frames são entregues, em ordem
+    captura = CapturaBaixaLatencia(FonteFalsa(frames_na_fila=5), descartar_atrasados=False)
+    sequencia = [int(captura.read()[1][0, 0, 0]) for _ in range(5)]
+    if sequencia != [1, 2, 3, 4, 5] or captura.frames_descartados != 0:
+        falhas.append(f"sem descarte: frames {sequencia} (esperado [1, 2, 3, 4, 5])")
+
+    # FOURCC não informado não pode ser relatado como falha na negociação
+    if "AVISO" in captura.descrever_modo():
+        falhas.append(f"FOURCC desconhecido relatado como falha: {captura.descrever_modo()}")
+
+    for falha in falhas:
+        print(f"FALHOU: {falha}")
+    if not falhas:
+        print("Verificação da captura: OK")
+    return not falhas
+
+
+def main():
+    """Mostra o modo negociado e a taxa real de leitura da câmera padrão"""
+    parser = argparse.ArgumentParser(description="Modo negociado e FPS real da câmera")
+    parser.add_argument("--camera", type=int, default=0, help="ID da câmera (padrão: 0)")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Verifica o descarte de frames com uma fonte falsa (sem câmera)")
+    args = parser.parse_args()
+
+    if args.verificar:
+        return 0 if verificar_descarte() else 1
+
+    try:
+        captura = CapturaBaixaLatencia(args.camera)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        return 1
+
+    print(f"Modo negociado: {captura.descrever_modo()}")
+    print("Medindo por 5 segundos...")
+
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < 5.0:
+        ret, _ = captura.read()
+        if not ret:
+            print("Erro: Não foi possível ler o frame")
+            break
+
+    decorrido = time.perf_counter() - inicio
+    print(f"  FPS medido: {captura.frames_lidos / decorrido:.1f}")
+    print(f"  Frames antigos descartados: {captura.frames_descartados}")
+    captura.release()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
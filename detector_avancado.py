@@ -3,27 +3,36 @@ Detector avançado de pessoa usando OpenCV
 Versão com mais opções de configuração e análise de posição
 """
 
+import os
+import time
+
 import cv2
 import numpy as np
 from datetime import datetime
 
+from captura import CapturaBaixaLatencia
+from mapa_ocupacao import MapaOcupacao, centros_caixas, limitar_intervalos
+from registro_sessao import RegistroSessao
+from zonas import ARQUIVO_ZONAS, ContadorZonas, MapaZonas
+
 class DetectorPessoa:
-    def __init__(self, camera_id=0, mostrar_fps=True):
+    def __init__(self, camera_id=0, mostrar_fps=True, diretorio_registro=None,
+                 meia_vida_mapa=None, arquivo_zonas=None):
         """
         Inicializa o detector de pessoa
         
         Args:
-            camera_id: ID da câmera (0 = câmera padrão)
+            camera_id: ID da câmera (0 = câmera padrão, None = sem câmera,
+                       apenas para processar imagens)
             mostrar_fps: Se True, mostra FPS na tela
+            diretorio_registro: Pasta do registro persistente da sessão (None = não grava)
+            meia_vida_mapa: Meia-vida (s) do mapa de ocupação (None = sem decaimento)
+            arquivo_zonas: Arquivo JSON com as zonas de contagem (None = sem zonas)
         """
-        self.cap = cv2.VideoCapture(camera_id)
-        if not self.cap.isOpened():
-            raise ValueError(f"Não foi possível abrir a câmera {camera_id}")
-        
-        # Configurações da câmera
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        # Configurações da câmera (MJPG, buffer mínimo e descarte de frames antigos)
+        self.cap = None
+        if camera_id is not None:
+            self.cap = CapturaBaixaLatencia(camera_id, largura=1280, altura=720, fps=30)
         
         # Inicializa detector HOG
         self.hog = cv2.HOGDescriptor()
@@ -37,6 +46,18 @@ class DetectorPessoa:
         # Histórico de detecções
         self.historico_deteccoes = []
         
+        # Registro persistente (gravado em lote por uma thread de fundo)
+        self.registro = RegistroSessao(diretorio_registro) if diretorio_registro else None
+        
+        # Mapa de ocupação (criado no primeiro frame, quando o tamanho é conhecido)
+        self.meia_vida_mapa = meia_vida_mapa
+        self.mapa = None
+        self.mostrar_mapa = False
+        self.tempo_ultimo_frame = None
+        
+        # Contagem por zonas
+        self.zonas = ContadorZonas(MapaZonas.carregar(arquivo_zonas)) if arquivo_zonas else None
+        
     def calcular_fps(self):
         """Calcula e atualiza o FPS"""
         self.frame_count += 1
@@ -147,13 +168,28 @@ class DetectorPessoa:
         cv2.putText(frame, timestamp, (largura_frame - 100, altura_frame - 10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
     
+    def atualizar_mapa(self, frame, centros):
+        """Acumula os centros das detecções no mapa de ocupação"""
+        if self.mapa is None:
+            altura, largura = frame.shape[:2]
+            self.mapa = MapaOcupacao(largura, altura, meia_vida=self.meia_vida_mapa)
+        
+        agora = time.perf_counter()
+        dt = limitar_intervalos(agora - self.tempo_ultimo_frame) if self.tempo_ultimo_frame else 0.0
+        self.tempo_ultimo_frame = agora
+        
+        self.mapa.acumular(centros, dt)
+    
     def executar(self):
         """Loop principal de detecção"""
         print("Detector avançado iniciado!")
+        print(f"Câmera: {self.cap.descrever_modo()}")
         print("Controles:")
         print("  'q' - Sair")
         print("  's' - Salvar screenshot")
         print("  'r' - Resetar estatísticas")
+        print("  'h' - Mostrar/ocultar mapa de ocupação")
+        print("  'e' - Exportar mapa de ocupação")
         
         screenshot_count = 0
         
@@ -173,6 +209,18 @@ class DetectorPessoa:
                     'timestamp': datetime.now(),
                     'count': len(deteccoes)
                 })
+                if self.registro:
+                    self.registro.registrar(time.time(), deteccoes,
+                                            resolucao=(frame.shape[1], frame.shape[0]))
+                
+                # Atualiza mapa de ocupação e contagem por zonas
+                centros = centros_caixas(deteccoes)
+                self.atualizar_mapa(frame, centros)
+                if self.mostrar_mapa:
+                    self.mapa.sobrepor(frame)
+                if self.zonas:
+                    self.zonas.atualizar(centros, frame.shape[1], frame.shape[0])
+                    self.zonas.desenhar(frame)
                 
                 # Desenha detecções
                 self.desenhar_deteccoes(frame, deteccoes)
@@ -197,7 +245,16 @@ class DetectorPessoa:
                     self.historico_deteccoes = []
                     self.frame_count = 0
                     self.tempo_inicio = cv2.getTickCount()
+                    self.mapa.resetar()
+                    if self.zonas:
+                        self.zonas.resetar()
                     print("Estatísticas resetadas")
+                elif key == ord('h'):
+                    self.mostrar_mapa = not self.mostrar_mapa
+                elif key == ord('e'):
+                    self.mapa.exportar('mapa_ocupacao.png')
+                    self.mapa.exportar('mapa_ocupacao.npz')
+                    print("Mapa de ocupação salvo: mapa_ocupacao.png / mapa_ocupacao.npz")
         
         except KeyboardInterrupt:
             print("\nInterrompido pelo usuário")
@@ -207,9 +264,14 @@ class DetectorPessoa:
     
     def encerrar(self):
         """Libera recursos e encerra o detector"""
-        self.cap.release()
+        if self.cap is not None:
+            self.cap.release()
         cv2.destroyAllWindows()
         
+        if self.registro:
+            self.registro.fechar()
+            print(f"Registro da sessão salvo em: {self.registro.diretorio}")
+        
         # Estatísticas finais
         if self.historico_deteccoes:
             total_deteccoes = sum(h['count'] for h in self.historico_deteccoes)
@@ -218,12 +280,20 @@ class DetectorPessoa:
             print(f"  Total de frames processados: {len(self.historico_deteccoes)}")
             print(f"  Média de pessoas por frame: {media_deteccoes:.2f}")
         
+        if self.zonas:
+            print("\nZonas:")
+            for zona in self.zonas.resumo():
+                print(f"  {zona['nome']}: entradas {zona['entradas']}, saídas {zona['saidas']}")
+        
         print("Detector encerrado!")
 
 
 def main():
     try:
-        detector = DetectorPessoa(camera_id=0, mostrar_fps=True)
+        arquivo_zonas = ARQUIVO_ZONAS if os.path.exists(ARQUIVO_ZONAS) else None
+        detector = DetectorPessoa(camera_id=0, mostrar_fps=True,
+                                  diretorio_registro='registro_pessoas',
+                                  arquivo_zonas=arquivo_zonas)
         detector.executar()
     except Exception as e:
         print(f"Erro: {e}")
@@ -0,0 +1,317 @@
+"""
+Detector de múltiplas cabeças com câmera acima (visão superior)
+Conta todas as cabeças do frame com Hough de múltiplos círculos ou blobs
+em uma imagem reduzida
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+from captura import CapturaBaixaLatencia
+from registro_sessao import RegistroSessao
+from zonas import ARQUIVO_ZONAS, ContadorZonas, MapaZonas
+
+# Pontos amostrados no perímetro de cada círculo para calcular a confiança
+PONTOS_PERIMETRO = 64
+
+# Caixas guardadas por frame no registro: cenas de multidão passam muito do
+# padrão do registro (16); cerca de 1 KB por frame
+MAX_CAIXAS_CABECAS = 128
+
+
+class DetectorCabecas:
+    def __init__(self, camera_id=0, largura_processamento=320, metodo='hough',
+                 min_diametro_percent=0.04, max_diametro_percent=0.20,
+                 px_por_cm=None, diametro_cabeca_cm=(14.0, 22.0),
+                 diretorio_registro=None, arquivo_zonas=None):
+        """
+        Inicializa o detector de cabeças
+
+        Args:
+            camera_id: ID da câmera (0 = câmera padrão, None = sem câmera,
+                       apenas para processar imagens)
+            largura_processamento: Largura da imagem reduzida usada na detecção
+            metodo: 'hough' (múltiplos círculos) ou 'blob' (SimpleBlobDetector)
+            min_diametro_percent: Diâmetro mínimo da cabeça (fração da largura do frame)
+            max_diametro_percent: Diâmetro máximo da cabeça (fração da largura do frame)
+            px_por_cm: Calibração opcional; se informada, o tamanho esperado da
+                       cabeça vem de diametro_cabeca_cm em vez dos percentuais
+            diametro_cabeca_cm: Faixa (mín, máx) de diâmetro real de cabeça em cm
+            diretorio_registro: Pasta do registro persistente da sessão (None = não grava)
+            arquivo_zonas: Arquivo JSON com as zonas de contagem (None = sem zonas)
+        """
+        if metodo not in ('hough', 'blob'):
+            raise ValueError(f"Método inválido: {metodo} (use 'hough' ou 'blob')")
+
+        self.cap = None
+        if camera_id is not None:
+            self.cap = CapturaBaixaLatencia(camera_id, largura=1280, altura=720, fps=30)
+
+        self.largura_processamento = largura_processamento
+        self.metodo = metodo
+
+        # Parâmetros do Hough (mesmo significado do detector de círculos)
+        self.param1 = 60
+        self.param2 = 18
+
+        # Prioris de tamanho
+        self.min_diametro_percent = min_diametro_percent
+        self.max_diametro_percent = max_diametro_percent
+        self.px_por_cm = px_por_cm
+        self.diametro_cabeca_cm = diametro_cabeca_cm
+
+        # O blob detector depende do tamanho do frame: criado sob demanda
+        self._blob_detector = None
+        self._blob_chave = None
+
+        self.registro = None
+        if diretorio_registro:
+            self.registro = RegistroSessao(diretorio_registro, max_caixas=MAX_CAIXAS_CABECAS)
+        self.zonas = ContadorZonas(MapaZonas.carregar(arquivo_zonas)) if arquivo_zonas else None
+
+    def limites_raio(self, largura):
+        """
+        Faixa de raio esperada (em pixels do frame original)
+
+        Returns:
+            Tupla (min_raio, max_raio)
+        """
+        if self.px_por_cm:
+            min_cm, max_cm = self.diametro_cabeca_cm
+            return min_cm * self.px_por_cm / 2, max_cm * self.px_por_cm / 2
+        return largura * self.min_diametro_percent / 2, largura * self.max_diametro_percent / 2
+
+    def preparar_imagem(self, frame):
+        """
+        Converte para cinza e reduz para a largura de processamento
+
+        Returns:
+            Tupla (imagem reduzida, fator de escala reduzida -> original)
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        escala = frame.shape[1] / self.largura_processamento
+        if escala > 1:
+            altura = int(round(frame.shape[0] / escala))
+            gray = cv2.resize(gray, (self.largura_processamento, altura), interpolation=cv2.INTER_AREA)
+        else:
+            escala = 1.0
+        return cv2.GaussianBlur(gray, (5, 5), 1.5), escala
+
+    def _detectar_hough(self, pequena, min_raio, max_raio):
+        """Hough de múltiplos círculos (sem parar no primeiro)"""
+        circles = cv2.HoughCircles(
+            pequena,
+            cv2.HOUGH_GRADIENT,
+            dp=1,
+            minDist=max(min_raio * 1.5, 2),
+            param1=self.param1,
+            param2=self.param2,
+            minRadius=max(int(min_raio), 1),
+            maxRadius=max(int(np.ceil(max_raio)), 2)
+        )
+        if circles is None:
+            return np.empty((0, 3), dtype=np.float64)
+        return circles[0, :, :3].astype(np.float64)
+
+    def _detectar_blob(self, pequena, min_raio, max_raio):
+        """Blobs escuros/claros aproximadamente circulares"""
+        chave = (int(min_raio), int(max_raio))
+        if self._blob_detector is None or self._blob_chave != chave:
+            parametros = cv2.SimpleBlobDetector_Params()
+            parametros.filterByArea = True
+            parametros.minArea = np.pi * min_raio ** 2
+            parametros.maxArea = np.pi * max_raio ** 2
+            parametros.filterByCircularity = True
+            parametros.minCircularity = 0.6
+            parametros.filterByConvexity = True
+            parametros.minConvexity = 0.8
+            parametros.filterByInertia = True
+            parametros.minInertiaRatio = 0.5
+            parametros.filterByColor = False
+            self._blob_detector = cv2.SimpleBlobDetector_create(parametros)
+            self._blob_chave = chave
+
+        pontos = self._blob_detector.detect(pequena)
+        if not pontos:
+            return np.empty((0, 3), dtype=np.float64)
+        return np.array([(p.pt[0], p.pt[1], p.size / 2) for p in pontos], dtype=np.float64)
+
+    def confianca_perimetro(self, pequena, circulos):
+        """
+        Confiança de cada círculo: fração do perímetro apoiada em bordas
+
+        Amostra PONTOS_PERIMETRO pontos no raio detectado e conta quantos
+        caem sobre uma borda do Canny (tolerância de 1 pixel). O valor é
+        comparável entre imagens, ao contrário da ordem de saída do Hough.
+
+        Args:
+            pequena: Imagem reduzida usada na detecção
+            circulos: Array (N, 3) com x, y, r na imagem reduzida
+
+        Returns:
+            Array (N,) com valores de 0 a 1
+        """
+        if len(circulos) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        bordas = cv2.dilate(cv2.Canny(pequena, self.param1 / 2, self.param1), None)
+        altura, largura = bordas.shape
+        angulos = np.linspace(0, 2 * np.pi, PONTOS_PERIMETRO, endpoint=False)
+        x = circulos[:, 0:1] + circulos[:, 2:3] * np.cos(angulos)
+        y = circulos[:, 1:2] + circulos[:, 2:3] * np.sin(angulos)
+        dentro = (x >= 0) & (x <= largura - 1) & (y >= 0) & (y <= altura - 1)
+        xi = np.clip(np.round(x).astype(np.int64), 0, largura - 1)
+        yi = np.clip(np.round(y).astype(np.int64), 0, altura - 1)
+        apoio = (bordas[yi, xi] > 0) & dentro
+        return apoio.mean(axis=1)
+
+    def detectar_cabecas(self, frame):
+        """
+        Detecta todas as cabeças do frame
+
+        Args:
+            frame: Frame de vídeo (BGR ou cinza)
+
+        Returns:
+            Lista de tuplas (x, y, r, score) no frame original, onde score
+            é a fração do perímetro apoiada em bordas (0 a 1)
+        """
+        pequena, escala = self.preparar_imagem(frame)
+        min_raio, max_raio = self.limites_raio(frame.shape[1])
+        min_raio_p, max_raio_p = min_raio / escala, max_raio / escala
+
+        if self.metodo == 'hough':
+            candidatos = self._detectar_hough(pequena, min_raio_p, max_raio_p)
+        else:
+            candidatos = self._detectar_blob(pequena, min_raio_p, max_raio_p)
+
+        candidatos = np.column_stack([candidatos, self.confianca_perimetro(pequena, candidatos)])
+
+        # Aplica os prioris de tamanho no frame original (vetorizado)
+        candidatos[:, :3] *= escala
+        validos = (candidatos[:, 2] >= min_raio) & (candidatos[:, 2] <= max_raio)
+        candidatos = candidatos[validos]
+
+        return [(int(round(x)), int(round(y)), int(round(r)), float(s)) for x, y, r, s in candidatos]
+
+    def desenhar_cabecas(self, frame, cabecas, fps):
+        """Desenha as cabeças detectadas e a contagem"""
+        for i, (x, y, r, _) in enumerate(cabecas):
+            cv2.circle(frame, (x, y), r, (0, 255, 0), 2)
+            cv2.circle(frame, (x, y), 3, (0, 0, 255), -1)
+            cv2.putText(frame, str(i + 1), (x - 5, y - r - 5),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+        cv2.putText(frame, f'Cabecas: {len(cabecas)}', (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        cv2.putText(frame, f'FPS: {fps:.1f}', (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(frame, f'Metodo: {self.metodo} | Param2: {self.param2}', (10, 90),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+
+    def executar(self):
+        """Loop principal"""
+        print("=" * 50)
+        print("Detector de Cabecas (visao superior)")
+        print("=" * 50)
+        print(f"Camera: {self.cap.descrever_modo()}")
+        print("Controles:")
+        print("  'q' - Sair")
+        print("  'b' - Alternar metodo (hough/blob)")
+        print("  '+/-' - Ajustar sensibilidade do Hough")
+        print("=" * 50)
+
+        frame_count = 0
+        tempo_inicio = cv2.getTickCount()
+        fps = 0
+        total_cabecas = 0
+        total_frames = 0
+
+        try:
+            while True:
+                ret, frame = self.cap.read()
+
+                if not ret:
+                    print("Erro: Não foi possível ler o frame")
+                    break
+
+                cabecas = self.detectar_cabecas(frame)
+                total_cabecas += len(cabecas)
+                total_frames += 1
+
+                if self.registro:
+                    caixas = [(x - r, y - r, 2 * r, 2 * r) for x, y, r, _ in cabecas]
+                    self.registro.registrar(time.time(), caixas, resolucao=(frame.shape[1], frame.shape[0]))
+
+                # Calcula FPS
+                frame_count += 1
+                tempo_atual = cv2.getTickCount()
+                tempo_decorrido = (tempo_atual - tempo_inicio) / cv2.getTickFrequency()
+                if tempo_decorrido > 1.0:
+                    fps = frame_count / tempo_decorrido
+                    frame_count = 0
+                    tempo_inicio = tempo_atual
+
+                if self.zonas:
+                    centros = [(x, y) for x, y, _, _ in cabecas]
+                    self.zonas.atualizar(centros, frame.shape[1], frame.shape[0])
+                    self.zonas.desenhar(frame)
+
+                self.desenhar_cabecas(frame, cabecas, fps)
+                cv2.imshow('Detector de Cabecas', frame)
+
+                key = cv2.waitKey(1) & 0xFF
+
+                if key == ord('q') or key == ord('Q'):
+                    break
+                elif key == ord('b') or key == ord('B'):
+                    self.metodo = 'blob' if self.metodo == 'hough' else 'hough'
+                    print(f"Metodo: {self.metodo}")
+                elif key == ord('+') or key == ord('='):
+                    self.param2 = max(self.param2 - 2, 5)
+                    print(f"Sensibilidade aumentada. Param2: {self.param2}")
+                elif key == ord('-') or key == ord('_'):
+                    self.param2 = min(self.param2 + 2, 100)
+                    print(f"Sensibilidade diminuida. Param2: {self.param2}")
+
+        except KeyboardInterrupt:
+            print("\nInterrompido pelo usuario")
+
+        finally:
+            self.encerrar()
+            if total_frames:
+                print(f"Media de cabecas por frame: {total_cabecas / total_frames:.2f}")
+            if self.zonas:
+                for zona in self.zonas.resumo():
+                    print(f"  {zona['nome']}: entradas {zona['entradas']}, saidas {zona['saidas']}")
+
+    def encerrar(self):
+        """Libera recursos"""
+        if self.cap is not None:
+            self.cap.release()
+        cv2.destroyAllWindows()
+
+        if self.registro:
+            self.registro.fechar()
+            print(f"Registro da sessao salvo em: {self.registro.diretorio}")
+
+        print("Detector encerrado!")
+
+
+def main():
+    try:
+        arquivo_zonas = ARQUIVO_ZONAS if os.path.exists(ARQUIVO_ZONAS) else None
+        detector = DetectorCabecas(camera_id=0, diretorio_registro='registro_cabecas',
+                                   arquivo_zonas=arquivo_zonas)
+        detector.executar()
+    except Exception as e:
+        print(f"Erro: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
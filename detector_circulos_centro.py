@@ -3,20 +3,54 @@ Detector de círculos no centro da imagem
 Especializado para medir diâmetro de cabeça (visão superior)
 """
 
+import json
+import os
+import time
+
 import cv2
 import numpy as np
 from datetime import datetime
 
+from captura import CapturaBaixaLatencia
+from mascara_fundo import ModeloBordasFundo
+from registro_sessao import RegistroSessao
+
+ARQUIVO_CALIBRACAO = 'calibracao.json'
+
+
+def ler_calibracao(caminho):
+    """Lê o fator de calibração (pixels por cm) de um arquivo JSON"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        try:
+            dados = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Calibração inválida em {caminho}: {e}")
+    if not isinstance(dados, dict):
+        raise ValueError(f"Calibração inválida em {caminho}: esperado um objeto com 'px_por_cm'")
+    try:
+        px_por_cm = float(dados.get('px_por_cm', 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"Calibração inválida em {caminho}: 'px_por_cm' não é um número")
+    if px_por_cm <= 0:
+        raise ValueError(f"Calibração inválida em {caminho}")
+    return px_por_cm
+
 class DetectorCirculoCentro:
-    def __init__(self, camera_id=0):
-        """Inicializa o detector"""
-        self.cap = cv2.VideoCapture(camera_id)
-        if not self.cap.isOpened():
-            raise ValueError(f"Não foi possível abrir a câmera {camera_id}")
-        
-        # Configurações da câmera
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    def __init__(self, camera_id=0, diretorio_registro=None, usar_mascara_fundo=True):
+        """
+        Inicializa o detector
+        
+        Args:
+            camera_id: ID da câmera (0 = câmera padrão, None = sem câmera,
+                       apenas para processar imagens)
+            diretorio_registro: Pasta do registro persistente da sessão (None = não grava)
+            usar_mascara_fundo: Se True, aprende as bordas fixas da cena e as remove
+                                antes do HoughCircles (use False para imagens avulsas)
+        """
+        # Configurações da câmera (MJPG, buffer mínimo e descarte de frames antigos)
+        self.cap = None
+        if camera_id is not None:
+            self.cap = CapturaBaixaLatencia(camera_id, largura=1280, altura=720, fps=30)
         
         # Parâmetros de detecção
         self.param1 = 50
@@ -27,15 +61,23 @@ class DetectorCirculoCentro:
         # Área central para detecção (60% do centro)
         self.zona_centro_percent = 0.60
         
+        # Modelo de bordas de fundo (câmera fixa)
+        self.modelo_fundo = ModeloBordasFundo() if usar_mascara_fundo else None
+        
         # Fator de calibração (pixels para cm)
         # Estimativa inicial: assumindo cabeça média ~18cm a ~60cm de distância
         # Será ajustado automaticamente ou pode ser calibrado
         self.calibracao_px_cm = None
+        # Calibração carregada de arquivo (mantida ao resetar a medição)
+        self.calibracao_fixa = None
         
         # Estado
         self.diametro_detectado = None
         self.medicao_realizada = False
         
+        # Registro persistente (gravado em lote por uma thread de fundo)
+        self.registro = RegistroSessao(diretorio_registro) if diretorio_registro else None
+        
     def calcular_fator_calibracao(self, raio_pixels, largura_imagem):
         """
         Calcula fator de calibração baseado em estimativas
@@ -58,6 +100,20 @@ class DetectorCirculoCentro:
         
         return self.calibracao_px_cm
     
+    def carregar_calibracao(self, caminho=ARQUIVO_CALIBRACAO):
+        """Carrega uma calibração fixa, no lugar da estimativa pela primeira medição"""
+        self.calibracao_fixa = ler_calibracao(caminho)
+        self.calibracao_px_cm = self.calibracao_fixa
+        return self.calibracao_px_cm
+    
+    def salvar_calibracao(self, caminho=ARQUIVO_CALIBRACAO):
+        """Salva a calibração atual para uso em outras sessões ou na medição em lote"""
+        if self.calibracao_px_cm is None:
+            return False
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump({'px_por_cm': self.calibracao_px_cm}, f, indent=2)
+        return True
+    
     def esta_na_zona_central(self, x, y, largura, altura):
         """Verifica se o círculo está na zona central"""
         centro_x = largura // 2
@@ -93,15 +149,24 @@ class DetectorCirculoCentro:
         min_radius = int(min(largura, altura) * self.min_radius_percent)
         max_radius = int(min(largura, altura) * self.max_radius_percent)
         
+        # Imagem pequena demais: raio mínimo 0 faz o HoughCircles falhar
+        if min_radius < 1:
+            return None, min_radius, max_radius
+        
         # Converte para escala de cinza
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Aplica desfoque gaussiano
         blurred = cv2.GaussianBlur(gray, (9, 9), 2)
         
+        # Remove bordas fixas do fundo (não votam no Hough)
+        entrada_hough = blurred
+        if self.modelo_fundo is not None:
+            entrada_hough = self.modelo_fundo.aplicar(blurred)
+        
         # Detecta círculos
         circles = cv2.HoughCircles(
-            blurred,
+            entrada_hough,
             cv2.HOUGH_GRADIENT,
             dp=1,
             minDist=min_radius * 2,
@@ -122,6 +187,10 @@ class DetectorCirculoCentro:
                     circulo_central = (x, y, r)
                     break  # Pega o primeiro círculo central encontrado
         
+        # Atualiza o modelo de fundo (em baixa frequência)
+        if self.modelo_fundo is not None:
+            self.modelo_fundo.atualizar(blurred, self.param1)
+        
         return circulo_central, min_radius, max_radius
     
     def desenhar_interface(self, frame, circulo_central, min_radius, max_radius, pronto_para_medir):
@@ -242,12 +311,15 @@ class DetectorCirculoCentro:
         print("=" * 50)
         print("Detector de Circulo no Centro")
         print("=" * 50)
+        print(f"Camera: {self.cap.descrever_modo()}")
         print("\nOrientacoes:")
         print("  1. Posicione a cabeca no centro da area amarela")
         print("  2. O tamanho detectavel e de 20% a 50% da imagem")
         print("  3. Pressione 'M' para medir o diametro")
         print("  4. Pressione '+/-' para ajustar sensibilidade")
-        print("  5. Pressione 'Q' para sair")
+        print("  5. Pressione 'C' para salvar a calibracao")
+        print("     Pressione 'F' para reaprender o fundo (camera movida)")
+        print("  6. Pressione 'Q' para sair")
         print("=" * 50)
         
         frame_count = 0
@@ -271,6 +343,11 @@ class DetectorCirculoCentro:
                 altura, largura = frame.shape[:2]
                 pronto_para_medir = self.esta_pronto_para_medir(circulo_central, min_radius, max_radius, largura, altura)
                 
+                if self.registro:
+                    self.registro.registrar(time.time(), circulo=circulo_central,
+                                            contagem=1 if circulo_central else 0,
+                                            resolucao=(largura, altura))
+                
                 # Desenha interface
                 self.desenhar_interface(frame, circulo_central, min_radius, max_radius, pronto_para_medir)
                 
@@ -313,8 +390,17 @@ class DetectorCirculoCentro:
                 elif key == ord('r') or key == ord('R'):
                     self.medicao_realizada = False
                     self.diametro_detectado = None
-                    self.calibracao_px_cm = None
+                    self.calibracao_px_cm = self.calibracao_fixa
                     print("Medicao resetada")
+                elif key == ord('f') or key == ord('F'):
+                    if self.modelo_fundo is not None:
+                        self.modelo_fundo.resetar()
+                        print("Modelo de fundo resetado")
+                elif key == ord('c') or key == ord('C'):
+                    if self.salvar_calibracao():
+                        print(f"Calibracao salva em {ARQUIVO_CALIBRACAO}: {self.calibracao_px_cm:.3f} px/cm")
+                    else:
+                        print("ERRO: Nenhuma calibracao para salvar. Realize uma medicao primeiro.")
         
         except KeyboardInterrupt:
             print("\nInterrompido pelo usuario")
@@ -324,9 +410,14 @@ class DetectorCirculoCentro:
     
     def encerrar(self):
         """Libera recursos"""
-        self.cap.release()
+        if self.cap is not None:
+            self.cap.release()
         cv2.destroyAllWindows()
         
+        if self.registro:
+            self.registro.fechar()
+            print(f"Registro da sessao salvo em: {self.registro.diretorio}")
+        
         if self.medicao_realizada:
             print(f"\nMedicao final: {self.diametro_detectado:.2f} cm")
         
@@ -335,7 +426,10 @@ class DetectorCirculoCentro:
 
 def main():
     try:
-        detector = DetectorCirculoCentro(camera_id=0)
+        detector = DetectorCirculoCentro(camera_id=0, diretorio_registro='registro_circulos')
+        if os.path.exists(ARQUIVO_CALIBRACAO):
+            detector.carregar_calibracao(ARQUIVO_CALIBRACAO)
+            print(f"Calibracao carregada de {ARQUIVO_CALIBRACAO}: {detector.calibracao_px_cm:.3f} px/cm")
         detector.executar()
     except Exception as e:
         print(f"Erro: {e}")
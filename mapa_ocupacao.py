@@ -0,0 +1,291 @@
+"""
+Mapa de ocupação incremental (heatmap) e tempo de permanência por célula
+Acumula centros de detecções em uma grade fixa com NumPy
+"""
+
+import argparse
+
+import cv2
+import numpy as np
+
+# Abaixo deste fator a escala do decaimento é reaplicada na grade
+ESCALA_MINIMA = 1e-6
+
+# Intervalo máximo (s) entre frames consecutivos; acima disso é uma quebra
+# de sessão (ou a câmera parou) e o frame não soma tempo de permanência
+INTERVALO_MAXIMO = 1.0
+
+
+def limitar_intervalos(dt, intervalo_maximo=INTERVALO_MAXIMO):
+    """
+    Zera os intervalos entre frames que indicam quebra de sessão
+
+    Args:
+        dt: Intervalo (s) desde o frame anterior (número ou array)
+        intervalo_maximo: Intervalos maiores (ou negativos) viram 0
+
+    Returns:
+        Mesmo tipo de dt, com os intervalos inválidos zerados
+    """
+    dt_array = np.asarray(dt, dtype=np.float64)
+    limitado = np.where((dt_array > intervalo_maximo) | (dt_array < 0), 0.0, dt_array)
+    return float(limitado) if limitado.ndim == 0 else limitado
+
+
+def centros_caixas(caixas):
+    """
+    Calcula o centro de cada caixa (x, y, w, h, ...)
+
+    Returns:
+        Array (N, 2) com as coordenadas (x, y) dos centros
+    """
+    if len(caixas) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    caixas = np.asarray([c[:4] for c in caixas], dtype=np.float64)
+    return caixas[:, :2] + caixas[:, 2:4] / 2
+
+
+class MapaOcupacao:
+    def __init__(self, largura, altura, celulas=(64, 36), meia_vida=None):
+        """
+        Inicializa a grade de ocupação
+
+        Args:
+            largura: Largura do frame em pixels
+            altura: Altura do frame em pixels
+            celulas: Número de células (colunas, linhas) da grade
+            meia_vida: Meia-vida do decaimento exponencial em segundos
+                       (None = sem decaimento, acumula para sempre)
+        """
+        self.largura = largura
+        self.altura = altura
+        self.colunas, self.linhas = celulas
+        self.meia_vida = meia_vida
+
+        n = self.colunas * self.linhas
+        # Ocupação guardada dividida por self.escala: o decaimento só altera
+        # a escala, e a grade inteira é corrigida raramente (custo O(N) por frame)
+        self._ocupacao = np.zeros(n, dtype=np.float64)
+        self.escala = 1.0
+        # Tempo de permanência: pessoa-segundos em cada célula (sem decaimento)
+        self.permanencia = np.zeros(n, dtype=np.float64)
+
+        self.frames = 0
+        self.deteccoes = 0
+        # Detecções contadas no registro sem caixa gravada (limite max_caixas)
+        self.deteccoes_sem_caixa = 0
+
+    def indices_celulas(self, centros):
+        """Converte centros (N, 2) em índices planos da grade"""
+        centros = np.asarray(centros, dtype=np.float64).reshape(-1, 2)
+        cx = (centros[:, 0] * self.colunas / self.largura).astype(np.int64)
+        cy = (centros[:, 1] * self.linhas / self.altura).astype(np.int64)
+        np.clip(cx, 0, self.colunas - 1, out=cx)
+        np.clip(cy, 0, self.linhas - 1, out=cy)
+        return cy * self.colunas + cx
+
+    def acumular(self, centros, dt=0.0, pesos=None):
+        """
+        Adiciona os centros de um frame à grade
+
+        Args:
+            centros: Array (N, 2) com os centros das detecções
+            dt: Duração do frame em segundos (decaimento e permanência)
+            pesos: Peso de cada detecção (padrão: 1)
+        """
+        self.frames += 1
+
+        if self.meia_vida and dt > 0:
+            self.escala *= 0.5 ** (dt / self.meia_vida)
+            if self.escala < ESCALA_MINIMA:
+                self._normalizar()
+
+        indices = self.indices_celulas(centros)
+        if len(indices) == 0:
+            return
+
+        if pesos is None:
+            pesos = np.ones(len(indices))
+        np.add.at(self._ocupacao, indices, np.asarray(pesos, dtype=np.float64) / self.escala)
+        if dt > 0:
+            np.add.at(self.permanencia, indices, dt)
+        self.deteccoes += len(indices)
+
+    def _normalizar(self):
+        """Aplica a escala acumulada na grade"""
+        self._ocupacao *= self.escala
+        self.escala = 1.0
+
+    @property
+    def ocupacao(self):
+        """Grade de ocupação (linhas, colunas) com o decaimento aplicado"""
+        return (self._ocupacao * self.escala).reshape(self.linhas, self.colunas)
+
+    def snapshot(self):
+        """
+        Copia o estado atual da grade
+
+        Returns:
+            Dicionário com ocupacao e permanencia (linhas, colunas), frames e deteccoes
+        """
+        return {
+            'ocupacao': self.ocupacao,
+            'permanencia': self.permanencia.reshape(self.linhas, self.colunas).copy(),
+            'frames': self.frames,
+            'deteccoes': self.deteccoes,
+        }
+
+    def resetar(self):
+        """Zera a grade"""
+        self._ocupacao[:] = 0
+        self.permanencia[:] = 0
+        self.escala = 1.0
+        self.frames = 0
+        self.deteccoes = 0
+        self.deteccoes_sem_caixa = 0
+
+    def imagem(self, tamanho=None, grade='ocupacao'):
+        """
+        Gera uma imagem colorida (BGR) da grade
+
+        Args:
+            tamanho: (largura, altura) da imagem (padrão: tamanho do frame)
+            grade: 'ocupacao' ou 'permanencia'
+        """
+        valores = self.ocupacao if grade == 'ocupacao' else self.permanencia.reshape(self.linhas, self.colunas)
+        maximo = valores.max()
+        normalizado = (valores * (255.0 / maximo)).astype(np.uint8) if maximo > 0 else \
+            np.zeros(valores.shape, dtype=np.uint8)
+        tamanho = tamanho or (self.largura, self.altura)
+        ampliado = cv2.resize(normalizado, tamanho, interpolation=cv2.INTER_LINEAR)
+        return cv2.applyColorMap(ampliado, cv2.COLORMAP_JET)
+
+    def sobrepor(self, frame, alpha=0.4):
+        """Desenha o mapa de ocupação sobre o frame (in-place)"""
+        altura, largura = frame.shape[:2]
+        cv2.addWeighted(self.imagem((largura, altura)), alpha, frame, 1 - alpha, 0, dst=frame)
+
+    def exportar(self, caminho):
+        """
+        Salva o mapa: .png/.jpg gravam a imagem colorida, qualquer
+        outra extensão grava os arrays em formato .npz
+        """
+        if caminho.lower().endswith(('.png', '.jpg', '.jpeg')):
+            cv2.imwrite(caminho, self.imagem())
+        else:
+            dados = self.snapshot()
+            np.savez_compressed(caminho, largura=self.largura, altura=self.altura,
+                                meia_vida=self.meia_vida or 0, **dados)
+        return caminho
+
+    @classmethod
+    def a_partir_do_registro(cls, leitor, largura, altura, inicio=None, fim=None,
+                             bloco=1_000_000, intervalo_maximo=INTERVALO_MAXIMO, **kwargs):
+        """
+        Monta o mapa a partir de um registro de sessão (registro_sessao.LeitorRegistro)
+
+        Processa as caixas gravadas em blocos, sem reprocessar vídeo. Como
+        no detector ao vivo, a duração de cada frame é o intervalo desde o
+        frame anterior; intervalos acima de intervalo_maximo (o registro junta
+        várias sessões) são tratados como início de sessão e não somam tempo.
+        Linhas gravadas com outra resolução (sessoes.json) são reescaladas
+        para largura x altura; linhas sem resolução gravada são usadas como estão.
+
+        Args:
+            leitor: LeitorRegistro aberto
+            largura: Largura do mapa (use leitor.resolucao() para a do registro)
+            altura: Altura do mapa
+            inicio: Timestamp inicial (inclusive) ou None
+            fim: Timestamp final (exclusivo) ou None
+            bloco: Número de linhas processadas por vez
+            intervalo_maximo: Maior intervalo (s) entre frames da mesma sessão
+            **kwargs: Repassados para o construtor (celulas, meia_vida)
+        """
+        mapa = cls(largura, altura, **kwargs)
+        i0, i1 = leitor.indices(inicio, fim)
+        if i1 <= i0:
+            return mapa
+
+        timestamps = leitor.colunas['timestamp']
+        ultimo = float(timestamps[i1 - 1])
+        for j in range(i0, i1, bloco):
+            k = min(j + bloco, i1)
+            ts = np.asarray(timestamps[j:k])
+            caixas = np.asarray(leitor.colunas['caixas'][j:k])
+            contagem = np.asarray(leitor.colunas['contagem'][j:k]).astype(np.int64)
+
+            # Duração de cada frame = intervalo desde o anterior (0 no primeiro
+            # frame do intervalo e após uma quebra de sessão)
+            anterior = float(timestamps[j - 1]) if j > i0 else ts[0]
+            dt = limitar_intervalos(np.diff(ts, prepend=anterior), intervalo_maximo)
+
+            validas = caixas[:, :, 2] >= 0
+            linhas = np.nonzero(validas)[0]
+            centros = caixas[validas][:, :2] + caixas[validas][:, 2:4] / 2
+
+            resolucoes = leitor.resolucoes(j, k)[linhas]
+            conhecidas = resolucoes[:, 0] > 0
+            centros[conhecidas] *= (largura, altura) / resolucoes[conhecidas]
+            pesos = np.ones(len(linhas))
+            if mapa.meia_vida:
+                pesos = 0.5 ** ((ultimo - ts[linhas]) / mapa.meia_vida)
+
+            indices = mapa.indices_celulas(centros)
+            np.add.at(mapa._ocupacao, indices, pesos)
+            np.add.at(mapa.permanencia, indices, dt[linhas])
+            mapa.frames += k - j
+            mapa.deteccoes += len(indices)
+            # Só há caixas descartadas nos frames com todas as posições ocupadas
+            cheios = validas.sum(axis=1) == caixas.shape[1]
+            mapa.deteccoes_sem_caixa += int((contagem[cheios] - caixas.shape[1]).clip(0).sum())
+
+        return mapa
+
+
+def main():
+    """Gera o mapa de ocupação a partir de um registro de sessão"""
+    from registro_sessao import LeitorRegistro, interpretar_data
+
+    parser = argparse.ArgumentParser(description="Mapa de ocupação a partir do registro de sessão")
+    parser.add_argument("diretorio", help="Pasta do registro (ex: registro_pessoas)")
+    parser.add_argument("--largura", type=int, help="Largura do mapa (padrão: a gravada no registro)")
+    parser.add_argument("--altura", type=int, help="Altura do mapa (padrão: a gravada no registro)")
+    parser.add_argument("--celulas", type=int, nargs=2, default=(64, 36),
+                        metavar=("COLUNAS", "LINHAS"), help="Tamanho da grade")
+    parser.add_argument("--meia-vida", type=float, help="Meia-vida do decaimento em segundos")
+    parser.add_argument("--inicio", help="Data inicial: AAAA-MM-DD ou 'AAAA-MM-DD HH:MM'")
+    parser.add_argument("--fim", help="Data final (exclusiva)")
+    parser.add_argument("--saida", default="mapa_ocupacao.png",
+                        help="Arquivo de saída (.png/.jpg para imagem, .npz para os dados)")
+    args = parser.parse_args()
+
+    try:
+        leitor = LeitorRegistro(args.diretorio)
+        inicio, fim = interpretar_data(args.inicio), interpretar_data(args.fim)
+        resolucao = leitor.resolucao(inicio, fim)
+        if resolucao is None:
+            resolucao = (1280, 720)
+            if args.largura is None or args.altura is None:
+                print("AVISO: O registro não tem a resolução do frame; "
+                      "usando 1280x720 (informe --largura/--altura)")
+        largura = args.largura or resolucao[0]
+        altura = args.altura or resolucao[1]
+        mapa = MapaOcupacao.a_partir_do_registro(
+            leitor, largura, altura, inicio=inicio, fim=fim,
+            celulas=tuple(args.celulas), meia_vida=args.meia_vida)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        return 1
+
+    mapa.exportar(args.saida)
+    print(f"Resolução: {largura}x{altura}")
+    print(f"Frames: {mapa.frames} | Detecções: {mapa.deteccoes}")
+    if mapa.deteccoes_sem_caixa:
+        print(f"AVISO: {mapa.deteccoes_sem_caixa} detecções sem caixa no registro "
+              f"(acima de {leitor.max_caixas} por frame) ficaram fora do mapa")
+    print(f"Mapa salvo em: {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,113 @@
+"""
+Modelo de bordas de fundo para câmera fixa
+Aprende as bordas persistentes da cena (móveis, piso, luminárias) e as
+remove antes do HoughCircles, reduzindo a votação e os falsos círculos
+"""
+
+import cv2
+import numpy as np
+
+
+class ModeloBordasFundo:
+    def __init__(self, intervalo_atualizacao=15, taxa_aprendizado=0.02, limiar=0.5,
+                 escala=0.5, dilatacao=2, tamanho_suavizacao=31):
+        """
+        Inicializa o modelo de bordas de fundo
+
+        Args:
+            intervalo_atualizacao: O modelo aprende a cada N frames
+            taxa_aprendizado: Peso de cada atualização na média de bordas
+            limiar: Fração do tempo em que um pixel precisa ser borda para
+                    ser considerado fundo (0 a 1)
+            escala: Fator de redução da imagem usada no aprendizado
+            dilatacao: Raio (em pixels reduzidos) da dilatação da máscara
+            tamanho_suavizacao: Tamanho do filtro que apaga as bordas mascaradas
+        """
+        self.intervalo_atualizacao = intervalo_atualizacao
+        self.taxa_aprendizado = taxa_aprendizado
+        self.limiar = limiar
+        self.escala = escala
+        self.tamanho_suavizacao = tamanho_suavizacao
+        self.kernel = cv2.getStructuringElement(
+            cv2.MORPH_ELLIPSE, (2 * dilatacao + 1, 2 * dilatacao + 1))
+
+        # Frequência de borda por pixel (imagem reduzida)
+        self.media_bordas = None
+        # Máscara do fundo no tamanho original (255 = borda de fundo)
+        self.mascara = None
+        self.atualizacoes = 0
+        self.frames = 0
+
+    def resetar(self):
+        """Descarta o que foi aprendido (ex: câmera mudou de posição)"""
+        self.media_bordas = None
+        self.mascara = None
+        self.atualizacoes = 0
+        self.frames = 0
+
+    def atualizar(self, gray, limiar_canny):
+        """
+        Atualiza o modelo com o frame atual (apenas a cada intervalo_atualizacao frames)
+
+        Uma borda só vira fundo depois de aparecer em boa parte das
+        atualizações (limiar), o que leva bem mais tempo que uma medição:
+        com os valores padrão, cerca de 30 s a 30 FPS. Círculos fixos da cena
+        (luminárias, ralos) também são aprendidos e deixam de ser detectados.
+
+        Args:
+            gray: Frame em escala de cinza (já suavizado)
+            limiar_canny: Limiar superior do Canny (mesmo param1 do HoughCircles)
+        """
+        self.frames += 1
+        if (self.frames - 1) % self.intervalo_atualizacao != 0:
+            return
+
+        altura, largura = gray.shape[:2]
+        pequena = cv2.resize(gray, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        bordas = cv2.Canny(pequena, limiar_canny / 2, limiar_canny).astype(np.float32) / 255.0
+
+        if self.media_bordas is None or self.media_bordas.shape != bordas.shape:
+            self.media_bordas = np.zeros(bordas.shape, dtype=np.float32)
+            self.atualizacoes = 0
+
+        cv2.accumulateWeighted(bordas, self.media_bordas, self.taxa_aprendizado)
+        self.atualizacoes += 1
+
+        mascara = (self.media_bordas >= self.limiar).astype(np.uint8) * 255
+        mascara = cv2.dilate(mascara, self.kernel)
+        self.mascara = cv2.resize(mascara, (largura, altura), interpolation=cv2.INTER_NEAREST)
+
+    def aplicar(self, gray):
+        """
+        Remove as bordas de fundo do frame
+
+        Os pixels mascarados recebem a média apenas dos pixels não
+        mascarados da vizinhança (média normalizada pela máscara). As bordas
+        de fundo não entram na média, então o preenchimento acompanha o nível
+        de cinza ao redor e não cria degraus (novas bordas) no contorno da
+        máscara. Onde toda a vizinhança é mascarada, usa a média simples.
+
+        Returns:
+            Nova imagem (ou a própria, se ainda não há máscara)
+        """
+        if self.mascara is None or self.mascara.shape != gray.shape[:2]:
+            return gray
+
+        k = (self.tamanho_suavizacao, self.tamanho_suavizacao)
+        livre = (self.mascara == 0).astype(np.float32)
+        soma = cv2.blur(gray.astype(np.float32) * livre, k)
+        peso = cv2.blur(livre, k)
+
+        preenchido = cv2.blur(gray, k)
+        validos = peso > 1e-3
+        preenchido[validos] = np.clip(soma[validos] / peso[validos] + 0.5, 0, 255)
+
+        resultado = gray.copy()
+        cv2.copyTo(preenchido, self.mascara, resultado)
+        return resultado
+
+    def fracao_mascarada(self):
+        """Fração da imagem considerada borda de fundo (0 a 1)"""
+        if self.mascara is None:
+            return 0.0
+        return float(np.count_nonzero(self.mascara)) / self.mascara.size
@@ -0,0 +1,180 @@
+"""
+Medição em lote do diâmetro de cabeça em imagens salvas
+Roda a mesma lógica do detector de círculo central sem interface,
+em um pool de processos, gravando os resultados em CSV
+"""
+
+import argparse
+import csv
+import os
+import time
+from multiprocessing import Pool
+
+import cv2
+
+from detector_circulos_centro import DetectorCirculoCentro, ler_calibracao
+
+EXTENSOES = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+CAMPOS_CSV = ['arquivo', 'x', 'y', 'r', 'diametro_cm', 'status']
+
+# Detector de cada processo do pool (criado uma vez no inicializador)
+_detector = None
+
+
+def listar_imagens(diretorios, recursivo=False):
+    """Lista as imagens dos diretórios (em ordem alfabética)"""
+    for diretorio in diretorios:
+        if os.path.isfile(diretorio):
+            yield diretorio
+            continue
+        if recursivo:
+            for raiz, pastas, arquivos in os.walk(diretorio):
+                pastas.sort()
+                for nome in sorted(arquivos):
+                    if nome.lower().endswith(EXTENSOES):
+                        yield os.path.join(raiz, nome)
+        else:
+            for nome in sorted(os.listdir(diretorio)):
+                caminho = os.path.join(diretorio, nome)
+                if nome.lower().endswith(EXTENSOES) and os.path.isfile(caminho):
+                    yield caminho
+
+
+def inicializar_processo(px_por_cm, atributos):
+    """Cria o detector do processo com a calibração fixa"""
+    global _detector
+    # Cada processo usa uma thread do OpenCV: o paralelismo vem do pool
+    cv2.setNumThreads(1)
+    # Imagens avulsas: sem modelo de fundo (não há cena fixa para aprender)
+    _detector = DetectorCirculoCentro(camera_id=None, usar_mascara_fundo=False)
+    for nome, valor in atributos.items():
+        setattr(_detector, nome, valor)
+    _detector.calibracao_px_cm = px_por_cm
+    _detector.calibracao_fixa = px_por_cm
+
+
+def medir_arquivo(caminho):
+    """
+    Mede uma imagem (detectar_circulo_central + esta_pronto_para_medir + realizar_medicao)
+
+    Returns:
+        Dicionário com arquivo, x, y, r, diametro_cm e status
+        (ok, sem_circulo, fora_da_area, erro_leitura ou erro_processamento)
+    """
+    try:
+        return _medir(caminho)
+    except Exception as e:
+        # Uma imagem problemática não pode interromper o lote inteiro
+        print(f"Erro ao processar {caminho}: {e}")
+        return {'arquivo': caminho, 'x': '', 'y': '', 'r': '', 'diametro_cm': '',
+                'status': 'erro_processamento'}
+
+
+def _medir(caminho):
+    """Corpo de medir_arquivo (pode lançar exceções do OpenCV)"""
+    linha = {'arquivo': caminho, 'x': '', 'y': '', 'r': '', 'diametro_cm': '', 'status': 'ok'}
+
+    frame = cv2.imread(caminho)
+    if frame is None:
+        linha['status'] = 'erro_leitura'
+        return linha
+
+    altura, largura = frame.shape[:2]
+    circulo_central, min_radius, max_radius = _detector.detectar_circulo_central(frame)
+    if circulo_central is None:
+        linha['status'] = 'sem_circulo'
+        return linha
+
+    x, y, r = (int(v) for v in circulo_central)
+    linha.update({'x': x, 'y': y, 'r': r})
+
+    if not _detector.esta_pronto_para_medir(circulo_central, min_radius, max_radius, largura, altura):
+        linha['status'] = 'fora_da_area'
+        return linha
+
+    _detector.realizar_medicao(circulo_central, largura)
+    linha['diametro_cm'] = f"{_detector.diametro_detectado:.2f}"
+    return linha
+
+
+def medir_lote(imagens, saida, px_por_cm, processos=None, atributos=None, tamanho_bloco=16):
+    """
+    Mede todas as imagens e grava o CSV à medida que os resultados chegam
+
+    Args:
+        imagens: Iterável com os caminhos das imagens
+        saida: Caminho do CSV de saída
+        px_por_cm: Calibração fixa (pixels por cm)
+        processos: Número de processos (padrão: número de núcleos)
+        atributos: Parâmetros do detector (ex: {'param2': 25})
+        tamanho_bloco: Imagens enviadas por vez para cada processo
+
+    Returns:
+        Dicionário status -> quantidade
+    """
+    contagem = {}
+    inicio = time.perf_counter()
+
+    with open(saida, 'w', newline='', encoding='utf-8') as f, \
+            Pool(processos, initializer=inicializar_processo, initargs=(px_por_cm, atributos or {})) as pool:
+        escritor = csv.DictWriter(f, fieldnames=CAMPOS_CSV)
+        escritor.writeheader()
+
+        for i, linha in enumerate(pool.imap_unordered(medir_arquivo, imagens, chunksize=tamanho_bloco), 1):
+            escritor.writerow(linha)
+            contagem[linha['status']] = contagem.get(linha['status'], 0) + 1
+            if i % 500 == 0:
+                f.flush()
+                decorrido = time.perf_counter() - inicio
+                print(f"  {i} imagens ({i / decorrido:.1f} imagens/s)")
+
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medição em lote do diâmetro de cabeça")
+    parser.add_argument("entradas", nargs="+", help="Pastas ou arquivos de imagem")
+    calibracao = parser.add_mutually_exclusive_group(required=True)
+    calibracao.add_argument("--calibracao", type=float, help="Calibração fixa em pixels por cm")
+    calibracao.add_argument("--arquivo-calibracao",
+                            help="Arquivo JSON de calibração (salvo com 'C' no detector de círculos)")
+    parser.add_argument("--saida", default="medicoes.csv", help="CSV de saída (padrão: medicoes.csv)")
+    parser.add_argument("--processos", type=int, help="Número de processos (padrão: todos os núcleos)")
+    parser.add_argument("--recursivo", action="store_true", help="Inclui subpastas")
+    parser.add_argument("--param2", type=int, help="Limiar de acumulação do Hough (padrão: 30)")
+    args = parser.parse_args()
+
+    try:
+        if args.calibracao is not None:
+            px_por_cm = args.calibracao
+        else:
+            px_por_cm = ler_calibracao(args.arquivo_calibracao)
+        if px_por_cm <= 0:
+            raise ValueError("A calibração deve ser maior que zero")
+        for entrada in args.entradas:
+            if not os.path.exists(entrada):
+                raise ValueError(f"Entrada não encontrada: {entrada}")
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+
+    atributos = {'param2': args.param2} if args.param2 else {}
+
+    print(f"Calibração: {px_por_cm:.3f} px/cm")
+    print(f"Processos: {args.processos or os.cpu_count()}")
+    inicio = time.perf_counter()
+    contagem = medir_lote(listar_imagens(args.entradas, args.recursivo), args.saida,
+                          px_por_cm, args.processos, atributos)
+    decorrido = time.perf_counter() - inicio
+
+    total = sum(contagem.values())
+    print(f"\n{total} imagens em {decorrido:.1f} s ({total / max(decorrido, 1e-9):.1f} imagens/s)")
+    for status, quantidade in sorted(contagem.items()):
+        print(f"  {status}: {quantidade}")
+    print(f"Resultados salvos em: {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
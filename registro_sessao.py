@@ -0,0 +1,478 @@
+"""
+Registro persistente de sessões em arquivos colunares de largura fixa
+Gravação em lote por thread de fundo e leitura via memory-map (NumPy)
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Número máximo de caixas guardadas por frame (padrão; as demais são
+# descartadas, mas a coluna contagem guarda sempre o total)
+MAX_CAIXAS = 16
+
+
+def definir_colunas(max_caixas=MAX_CAIXAS):
+    """Nome da coluna -> (dtype, formato de cada linha)"""
+    return {
+        'timestamp': ('<f8', ()),
+        'contagem': ('<u2', ()),
+        'caixas': ('<i2', (max_caixas, 4)),
+        'circulo_x': ('<i2', ()),
+        'circulo_y': ('<i2', ()),
+        'circulo_r': ('<i2', ()),
+    }
+
+
+COLUNAS = definir_colunas()
+
+ARQUIVO_FORMATO = 'formato.json'
+VERSAO_FORMATO = 1
+
+# Resolução do frame a partir de cada linha: lista de {"linha", "largura", "altura"}
+# (uma entrada nova só quando a resolução muda, ex: câmera negociou outro modo)
+ARQUIVO_SESSOES = 'sessoes.json'
+
+# Duração de cada período de agregação em segundos
+PERIODOS = {
+    'minuto': 60,
+    'hora': 3600,
+    'dia': 86400,
+}
+
+
+# Granularidade (s) da consulta do fuso horário: as mudanças de horário de
+# verão acontecem em horas cheias ou meias horas
+GRANULARIDADE_FUSO = 900
+
+
+def deslocamento_local(timestamps):
+    """
+    Deslocamento UTC -> horário local (em segundos) de cada timestamp
+
+    O fuso é consultado uma vez por intervalo distinto de 15 minutos no
+    array, então respeita mudanças de horário de verão dentro do período.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    chaves = (timestamps // GRANULARIDADE_FUSO).astype(np.int64)
+    unicas, inverso = np.unique(chaves, return_inverse=True)
+    deslocamentos = np.array([time.localtime(int(c) * GRANULARIDADE_FUSO).tm_gmtoff for c in unicas],
+                             dtype=np.float64)
+    return deslocamentos[inverso.reshape(-1)]
+
+
+def caminho_coluna(diretorio, nome):
+    """Caminho do arquivo de uma coluna (ex: registro/contagem.u2)"""
+    dtype = COLUNAS[nome][0]
+    return os.path.join(diretorio, f"{nome}.{dtype[1:]}")
+
+
+def ler_sessoes(diretorio):
+    """Lê as resoluções gravadas no registro (lista vazia em registros antigos)"""
+    caminho = os.path.join(diretorio, ARQUIVO_SESSOES)
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def tamanho_linha(nome, colunas=COLUNAS):
+    """Quantidade de bytes ocupada por uma linha da coluna"""
+    dtype, formato = colunas[nome]
+    return np.dtype(dtype).itemsize * int(np.prod(formato, dtype=np.int64))
+
+
+class RegistroSessao:
+    def __init__(self, diretorio, intervalo_flush=1.0, max_caixas=MAX_CAIXAS):
+        """
+        Abre (ou cria) um registro de sessão em modo somente-acréscimo
+
+        Args:
+            diretorio: Pasta onde ficam os arquivos de cada coluna
+            intervalo_flush: Segundos entre gravações em lote no disco
+            max_caixas: Caixas guardadas por frame (fixo no formato do registro)
+        """
+        self.diretorio = diretorio
+        self.intervalo_flush = intervalo_flush
+        self.max_caixas = max_caixas
+        self.colunas = definir_colunas(max_caixas)
+        os.makedirs(diretorio, exist_ok=True)
+        self._verificar_formato()
+
+        # Fila de linhas pendentes (protegida por lock)
+        self._pendentes = []
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+        # Linhas já gravadas nesta sessão
+        self.linhas_gravadas = 0
+        # Frames com mais de max_caixas caixas (as excedentes não são gravadas)
+        self.frames_truncados = 0
+
+        self._arquivos = {
+            nome: open(caminho_coluna(diretorio, nome), 'ab')
+            for nome in self.colunas
+        }
+        # Índice da próxima linha no arquivo (gravada ou na fila)
+        self._proxima_linha = self._alinhar_colunas()
+        self._sessoes = ler_sessoes(diretorio)
+
+        self._thread = threading.Thread(target=self._loop_flush, daemon=True)
+        self._thread.start()
+
+    def _verificar_formato(self):
+        """Grava ou confere o arquivo de formato do diretório"""
+        caminho = os.path.join(self.diretorio, ARQUIVO_FORMATO)
+        formato = {
+            'versao': VERSAO_FORMATO,
+            'colunas': {nome: [dtype, list(forma)] for nome, (dtype, forma) in self.colunas.items()},
+        }
+        if os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                existente = json.load(f)
+            if existente != formato:
+                raise ValueError(f"Formato incompatível no registro {self.diretorio} "
+                                 f"(registro gravado com outro formato ou max_caixas)")
+        else:
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump(formato, f, indent=2)
+
+    def _alinhar_colunas(self):
+        """
+        Corta colunas com linhas a mais (gravação interrompida no meio de um lote)
+        para que todas tenham o mesmo número de linhas
+        """
+        linhas = min(
+            os.path.getsize(caminho_coluna(self.diretorio, nome)) // tamanho_linha(nome, self.colunas)
+            for nome in self.colunas
+        )
+        for nome, arquivo in self._arquivos.items():
+            tamanho = linhas * tamanho_linha(nome, self.colunas)
+            if arquivo.tell() != tamanho:
+                arquivo.truncate(tamanho)
+                arquivo.seek(tamanho)
+        return linhas
+
+    def registrar(self, timestamp, caixas=(), circulo=None, contagem=None, resolucao=None):
+        """
+        Adiciona um frame ao registro (não bloqueia: só entra na fila)
+
+        Args:
+            timestamp: Tempo do frame em segundos (time.time())
+            caixas: Lista de caixas (x, y, w, h, ...) detectadas
+            circulo: Tupla (x, y, r) ou None
+            contagem: Número de detecções (padrão: len(caixas))
+            resolucao: Tupla (largura, altura) do frame; gravada em
+                       sessoes.json apenas quando muda
+        """
+        if contagem is None:
+            contagem = len(caixas)
+        if len(caixas) > self.max_caixas:
+            # A contagem continua completa; só as caixas excedentes se perdem
+            if self.frames_truncados == 0:
+                print(f"AVISO: Frame com {len(caixas)} caixas; o registro {self.diretorio} "
+                      f"guarda apenas {self.max_caixas} por frame")
+            self.frames_truncados += 1
+        linha = (timestamp, contagem, [tuple(c[:4]) for c in caixas[:self.max_caixas]], circulo)
+        with self._lock:
+            if resolucao is not None:
+                self._registrar_resolucao(*resolucao)
+            self._pendentes.append(linha)
+            self._proxima_linha += 1
+
+    def _registrar_resolucao(self, largura, altura):
+        """Grava a resolução a partir da próxima linha, se for diferente da atual"""
+        atual = self._sessoes[-1] if self._sessoes else None
+        if atual and (atual['largura'], atual['altura']) == (int(largura), int(altura)):
+            return
+
+        # Entradas além do fim do arquivo vêm de uma sessão interrompida antes do flush
+        self._sessoes = [s for s in self._sessoes if s['linha'] < self._proxima_linha]
+        self._sessoes.append({'linha': self._proxima_linha, 'largura': int(largura), 'altura': int(altura)})
+
+        caminho = os.path.join(self.diretorio, ARQUIVO_SESSOES)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self._sessoes, f, indent=2)
+        os.replace(caminho + '.tmp', caminho)
+
+    def _loop_flush(self):
+        """Thread de fundo: grava as linhas pendentes a cada intervalo"""
+        while not self._parar.wait(self.intervalo_flush):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Erro ao gravar registro em {self.diretorio}: {e}")
+
+    def flush(self):
+        """Grava no disco todas as linhas pendentes em um único lote"""
+        with self._lock:
+            lote, self._pendentes = self._pendentes, []
+        if not lote:
+            return
+
+        n = len(lote)
+        # Colunas com sinal usam -1 para "sem valor" (caixa ou círculo ausente)
+        colunas = {
+            nome: np.full((n,) + forma, -1 if np.dtype(dtype).kind == 'i' else 0, dtype=dtype)
+            for nome, (dtype, forma) in self.colunas.items()
+        }
+        for i, (timestamp, contagem, caixas, circulo) in enumerate(lote):
+            colunas['timestamp'][i] = timestamp
+            colunas['contagem'][i] = min(contagem, np.iinfo(np.uint16).max)
+            if caixas:
+                colunas['caixas'][i, :len(caixas)] = caixas
+            if circulo is not None:
+                colunas['circulo_x'][i], colunas['circulo_y'][i], colunas['circulo_r'][i] = circulo
+
+        for nome, arquivo in self._arquivos.items():
+            arquivo.write(colunas[nome].tobytes())
+            arquivo.flush()
+        self.linhas_gravadas += n
+
+    def fechar(self):
+        """Para a thread de fundo, grava o que falta e fecha os arquivos"""
+        self._parar.set()
+        self._thread.join()
+        self.flush()
+        for arquivo in self._arquivos.values():
+            arquivo.close()
+
+
+class LeitorRegistro:
+    def __init__(self, diretorio):
+        """
+        Abre um registro de sessão para leitura via memory-map
+
+        Nada é carregado na memória: as colunas são mapeadas e só as
+        páginas efetivamente acessadas são lidas do disco.
+
+        Args:
+            diretorio: Pasta do registro
+        """
+        caminho_formato = os.path.join(diretorio, ARQUIVO_FORMATO)
+        if not os.path.exists(caminho_formato):
+            raise ValueError(f"Registro não encontrado em {diretorio}")
+
+        # O número de caixas por frame pode variar entre registros
+        with open(caminho_formato, 'r', encoding='utf-8') as f:
+            formato = json.load(f)
+        formato_colunas = {nome: (dtype, tuple(forma)) for nome, (dtype, forma) in formato['colunas'].items()}
+        self.max_caixas = formato_colunas['caixas'][1][0]
+
+        self.diretorio = diretorio
+        # Usa o menor número de linhas: o gravador pode estar no meio de um lote
+        self.linhas = min(
+            os.path.getsize(caminho_coluna(diretorio, nome)) // tamanho_linha(nome, formato_colunas)
+            for nome in formato_colunas
+        )
+
+        self.colunas = {}
+        for nome, (dtype, forma) in formato_colunas.items():
+            if self.linhas == 0:
+                self.colunas[nome] = np.empty((0,) + forma, dtype=dtype)
+            else:
+                self.colunas[nome] = np.memmap(caminho_coluna(diretorio, nome), dtype=dtype,
+                                               mode='r', shape=(self.linhas,) + forma)
+
+        # Resolução do frame por trecho de linhas (0 = não gravada)
+        sessoes = ler_sessoes(diretorio)
+        self._linha_sessao = np.array([s['linha'] for s in sessoes], dtype=np.int64)
+        self._resolucao_sessao = np.array([(s['largura'], s['altura']) for s in sessoes],
+                                          dtype=np.int64).reshape(-1, 2)
+
+    def __len__(self):
+        return self.linhas
+
+    def indices(self, inicio=None, fim=None):
+        """
+        Converte um intervalo de tempo em índices de linha (busca binária)
+
+        Args:
+            inicio: Timestamp inicial (inclusive) ou None
+            fim: Timestamp final (exclusivo) ou None
+
+        Returns:
+            Tupla (i0, i1) para fatiar as colunas
+        """
+        timestamps = self.colunas['timestamp']
+        i0 = 0 if inicio is None else int(np.searchsorted(timestamps, inicio, side='left'))
+        i1 = self.linhas if fim is None else int(np.searchsorted(timestamps, fim, side='left'))
+        return i0, max(i0, i1)
+
+    def resolucoes(self, j, k):
+        """
+        Resolução do frame de cada linha de j a k
+
+        Returns:
+            Array (k - j, 2) com (largura, altura); 0 nas linhas sem
+            resolução gravada (registros antigos)
+        """
+        resultado = np.zeros((k - j, 2), dtype=np.int64)
+        if len(self._linha_sessao) == 0:
+            return resultado
+        sessao = np.searchsorted(self._linha_sessao, np.arange(j, k), side='right') - 1
+        conhecidas = sessao >= 0
+        resultado[conhecidas] = self._resolucao_sessao[sessao[conhecidas]]
+        return resultado
+
+    def resolucao(self, inicio=None, fim=None):
+        """
+        Resolução da última linha do intervalo com resolução gravada
+
+        Returns:
+            Tupla (largura, altura) ou None se o registro não a tem
+        """
+        i0, i1 = self.indices(inicio, fim)
+        if i1 <= i0 or len(self._linha_sessao) == 0 or self._linha_sessao[0] >= i1:
+            return None
+        sessao = int(np.searchsorted(self._linha_sessao, i1 - 1, side='right')) - 1
+        return tuple(int(v) for v in self._resolucao_sessao[sessao])
+
+    def intervalo(self, inicio=None, fim=None, colunas=None):
+        """
+        Retorna as colunas de um intervalo de tempo (visões do memory-map, sem cópia)
+
+        Args:
+            inicio: Timestamp inicial (inclusive) ou None
+            fim: Timestamp final (exclusivo) ou None
+            colunas: Nomes das colunas desejadas (padrão: todas)
+
+        Returns:
+            Dicionário nome -> array
+        """
+        i0, i1 = self.indices(inicio, fim)
+        nomes = colunas or list(self.colunas)
+        return {nome: self.colunas[nome][i0:i1] for nome in nomes}
+
+    def _periodos_locais(self, j, k, segundos):
+        """Índice do período (no horário local) de cada linha de j a k"""
+        ts = np.asarray(self.colunas['timestamp'][j:k])
+        return ((ts + deslocamento_local(ts)) // segundos).astype(np.int64)
+
+    def agregar(self, periodo='hora', inicio=None, fim=None, bloco=1_000_000):
+        """
+        Agrega contagens por período do horário local
+
+        Processa o intervalo em blocos de linhas para manter o uso de
+        memória constante mesmo com semanas de dados.
+
+        Args:
+            periodo: 'minuto', 'hora' ou 'dia'
+            inicio: Timestamp inicial (inclusive) ou None
+            fim: Timestamp final (exclusivo) ou None
+            bloco: Número de linhas processadas por vez
+
+        Returns:
+            Dicionário com arrays: inicio (timestamp de cada período), frames,
+            total, media, maximo e frames_com_circulo (apenas períodos com dados)
+        """
+        if periodo not in PERIODOS:
+            raise ValueError(f"Período inválido: {periodo} (use {', '.join(PERIODOS)})")
+
+        segundos = PERIODOS[periodo]
+        i0, i1 = self.indices(inicio, fim)
+        vazio = {
+            'inicio': np.empty(0), 'frames': np.empty(0, dtype=np.int64),
+            'total': np.empty(0, dtype=np.int64), 'media': np.empty(0),
+            'maximo': np.empty(0, dtype=np.int64), 'frames_com_circulo': np.empty(0, dtype=np.int64),
+        }
+        if i1 <= i0:
+            return vazio
+
+        # Períodos contados no horário local de cada frame, para que "dia"
+        # comece à meia-noite local mesmo com mudança de horário de verão.
+        # O horário local não é monótono (hora repetida no fim do horário de
+        # verão, relógio ajustado para trás), então os extremos vêm de uma
+        # primeira passada só pelos timestamps
+        primeiro, ultimo = None, None
+        for j in range(i0, i1, bloco):
+            periodos = self._periodos_locais(j, min(j + bloco, i1), segundos)
+            primeiro = periodos.min() if primeiro is None else min(primeiro, periodos.min())
+            ultimo = periodos.max() if ultimo is None else max(ultimo, periodos.max())
+        n_periodos = int(ultimo - primeiro) + 1
+
+        frames = np.zeros(n_periodos, dtype=np.int64)
+        total = np.zeros(n_periodos, dtype=np.int64)
+        maximo = np.zeros(n_periodos, dtype=np.int64)
+        com_circulo = np.zeros(n_periodos, dtype=np.int64)
+
+        for j in range(i0, i1, bloco):
+            k = min(j + bloco, i1)
+            contagem = np.asarray(self.colunas['contagem'][j:k]).astype(np.int64)
+            raio = np.asarray(self.colunas['circulo_r'][j:k])
+
+            idx = self._periodos_locais(j, k, segundos) - primeiro
+            frames += np.bincount(idx, minlength=n_periodos)
+            total += np.bincount(idx, weights=contagem, minlength=n_periodos).astype(np.int64)
+            com_circulo += np.bincount(idx, weights=raio >= 0, minlength=n_periodos).astype(np.int64)
+            np.maximum.at(maximo, idx, contagem)
+
+        validos = frames > 0
+        # Início de cada período: horário local convertido de volta para timestamp
+        inicios = np.array([
+            (datetime(1970, 1, 1) + timedelta(seconds=int(p) * segundos)).timestamp()
+            for p in np.nonzero(validos)[0] + primeiro
+        ], dtype=np.float64)
+        return {
+            'inicio': inicios,
+            'frames': frames[validos],
+            'total': total[validos],
+            'media': total[validos] / frames[validos],
+            'maximo': maximo[validos],
+            'frames_com_circulo': com_circulo[validos],
+        }
+
+
+def interpretar_data(texto):
+    """Converte 'AAAA-MM-DD' ou 'AAAA-MM-DD HH:MM' (horário local) em timestamp"""
+    if texto is None:
+        return None
+    for formato in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato).timestamp()
+        except ValueError:
+            pass
+    raise ValueError(f"Data inválida: {texto} (use AAAA-MM-DD ou 'AAAA-MM-DD HH:MM')")
+
+
+def main():
+    """Resumo offline de um registro de sessão"""
+    parser = argparse.ArgumentParser(description="Resumo de registros de sessão")
+    parser.add_argument("diretorio", help="Pasta do registro (ex: registro_pessoas)")
+    parser.add_argument("--por", choices=list(PERIODOS), default="hora",
+                        help="Período de agregação (padrão: hora)")
+    parser.add_argument("--inicio", help="Data inicial: AAAA-MM-DD ou 'AAAA-MM-DD HH:MM'")
+    parser.add_argument("--fim", help="Data final (exclusiva)")
+    args = parser.parse_args()
+
+    try:
+        leitor = LeitorRegistro(args.diretorio)
+        resumo = leitor.agregar(args.por, interpretar_data(args.inicio), interpretar_data(args.fim))
+    except ValueError as e:
+        print(f"Erro: {e}")
+        return 1
+
+    print(f"Registro: {args.diretorio} ({len(leitor)} frames)")
+    if len(resumo['frames']) == 0:
+        print("Nenhum frame no intervalo")
+        return 0
+
+    formato_data = "%Y-%m-%d" if args.por == "dia" else "%Y-%m-%d %H:%M"
+    print(f"{'Período':<18}{'Frames':>10}{'Média':>10}{'Máximo':>10}{'Círculos':>10}")
+    for i in range(len(resumo['frames'])):
+        data = datetime.fromtimestamp(resumo['inicio'][i]).strftime(formato_data)
+        print(f"{data:<18}{resumo['frames'][i]:>10}{resumo['media'][i]:>10.2f}"
+              f"{resumo['maximo'][i]:>10}{resumo['frames_com_circulo'][i]:>10}")
+
+    print(f"\nTotal de frames: {resumo['frames'].sum()}")
+    print(f"Média geral de pessoas por frame: {resumo['total'].sum() / resumo['frames'].sum():.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
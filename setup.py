@@ -131,6 +131,7 @@ def mostrar_comandos():
         print("   venv\\Scripts\\Activate.ps1")
         print("\n2. Execute um detector:")
         print("   python detector_circulos_centro.py")
+        print("   python detector_cabecas.py")
         print("   python detector_basico.py")
         print("   python detector_avancado.py")
     else:
@@ -138,6 +139,7 @@ def mostrar_comandos():
         print("   source venv/bin/activate")
         print("\n2. Execute um detector:")
         print("   python3 detector_circulos_centro.py")
+        print("   python3 detector_cabecas.py")
         print("   python3 detector_basico.py")
         print("   python3 detector_avancado.py")
     
@@ -0,0 +1,335 @@
+"""
+Contagem por zonas poligonais (entradas, filas, balcões)
+As zonas são rasterizadas uma vez por resolução em um mapa de rótulos e
+os centros das detecções são classificados com uma única consulta NumPy
+
+Formato do arquivo de zonas (JSON):
+
+    {
+        "coordenadas": "normalizadas",
+        "zonas": [
+            {"nome": "entrada", "pontos": [[0.0, 0.0], [0.3, 0.0], [0.3, 1.0], [0.0, 1.0]]},
+            {"nome": "fila", "pontos": [[0.4, 0.2], [0.8, 0.2], [0.8, 0.6], [0.4, 0.6]]}
+        ]
+    }
+
+Nas coordenadas normalizadas, 0 é o primeiro pixel e 1 é o último. Com
+"coordenadas": "pixels", informe também "resolucao": [largura, altura] da
+imagem em que os pontos foram marcados; um ponto em x = largura - 1 continua
+na última coluna em qualquer resolução. Se duas zonas se sobrepõem, a
+que aparece depois no arquivo prevalece na área comum.
+"""
+
+import json
+
+import cv2
+import numpy as np
+
+ARQUIVO_ZONAS = 'zonas.json'
+
+# Multiplicador da coluna na chave de célula da grade de associação
+# (comporta linhas de célula com |índice| < 2^31)
+CHAVE_COLUNA = 1 << 32
+
+
+class MapaZonas:
+    def __init__(self, nomes, poligonos):
+        """
+        Inicializa o mapa de zonas
+
+        Args:
+            nomes: Nome de cada zona
+            poligonos: Pontos de cada zona em coordenadas normalizadas (0 a 1)
+        """
+        if len(nomes) != len(poligonos):
+            raise ValueError("Cada zona precisa de um nome e de um polígono")
+        if len(nomes) > np.iinfo(np.uint16).max - 1:
+            raise ValueError(f"Número de zonas acima do suportado: {len(nomes)}")
+
+        self.nomes = list(nomes)
+        self.poligonos = []
+        for nome, pontos in zip(self.nomes, poligonos):
+            pontos = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+            if len(pontos) < 3:
+                raise ValueError(f"A zona '{nome}' precisa de pelo menos 3 pontos")
+            self.poligonos.append(pontos)
+
+        # Mapa de rótulos por resolução: (largura, altura) -> array (0 = fora das zonas)
+        self._mapas = {}
+
+    @classmethod
+    def carregar(cls, caminho=ARQUIVO_ZONAS):
+        """Lê as zonas de um arquivo JSON"""
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+
+        zonas = dados.get('zonas', [])
+        if not zonas:
+            raise ValueError(f"Nenhuma zona definida em {caminho}")
+
+        escala = np.array([1.0, 1.0])
+        if dados.get('coordenadas', 'normalizadas') == 'pixels':
+            if 'resolucao' not in dados:
+                raise ValueError(f"Zonas em pixels exigem 'resolucao' em {caminho}")
+            # Último pixel (largura - 1) corresponde a 1.0, como em pontos_pixels
+            escala = 1.0 / (np.asarray(dados['resolucao'], dtype=np.float64) - 1)
+
+        nomes = [z.get('nome', f"zona_{i + 1}") for i, z in enumerate(zonas)]
+        poligonos = [np.asarray(z['pontos'], dtype=np.float64) * escala for z in zonas]
+        return cls(nomes, poligonos)
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def pontos_pixels(self, indice, largura, altura):
+        """Pontos da zona em pixels para a resolução (0 -> 0, 1 -> último pixel)"""
+        return np.round(self.poligonos[indice] * (largura - 1, altura - 1)).astype(np.int32)
+
+    def mapa_rotulos(self, largura, altura):
+        """
+        Mapa de rótulos para a resolução (rasterizado uma única vez)
+
+        Returns:
+            Array (altura, largura) com o índice da zona + 1 em cada pixel
+        """
+        chave = (largura, altura)
+        mapa = self._mapas.get(chave)
+        if mapa is None:
+            dtype = np.uint8 if len(self.nomes) < 255 else np.uint16
+            mapa = np.zeros((altura, largura), dtype=dtype)
+            for indice in range(len(self.poligonos)):
+                cv2.fillPoly(mapa, [self.pontos_pixels(indice, largura, altura)], indice + 1)
+            self._mapas[chave] = mapa
+        return mapa
+
+    def classificar(self, centros, largura, altura):
+        """
+        Zona de cada centro
+
+        Args:
+            centros: Array (N, 2) com os centros (x, y) em pixels
+            largura: Largura do frame
+            altura: Altura do frame
+
+        Returns:
+            Array (N,) com o índice da zona de cada centro (-1 = fora das zonas)
+        """
+        centros = np.asarray(centros, dtype=np.float64).reshape(-1, 2)
+        mapa = self.mapa_rotulos(largura, altura)
+        x = np.clip(centros[:, 0].astype(np.int64), 0, largura - 1)
+        y = np.clip(centros[:, 1].astype(np.int64), 0, altura - 1)
+        return mapa[y, x].astype(np.int64) - 1
+
+    def contar(self, centros, largura, altura):
+        """
+        Número de centros em cada zona
+
+        Returns:
+            Array (número de zonas,) com as contagens
+        """
+        rotulos = self.classificar(centros, largura, altura) + 1
+        return np.bincount(rotulos, minlength=len(self.nomes) + 1)[1:]
+
+
+class ContadorZonas:
+    def __init__(self, mapa_zonas, distancia_maxima=None, frames_confirmacao=3, frames_perdido=5):
+        """
+        Mantém as contagens por zona e os contadores de entrada/saída
+
+        Os centros de cada frame são associados aos do frame anterior (vizinho
+        mais próximo, até distancia_maxima), formando trilhas. Uma entrada ou
+        saída só é contada quando uma trilha muda de zona e permanece na nova
+        zona por frames_confirmacao frames. Uma trilha que some por até
+        frames_perdido frames (falha do detector) é retomada sem contar nada.
+
+        A associação usa uma grade de células de lado distancia_maxima, então
+        o custo por frame é linear no número de detecções; ele só cresce mais
+        que isso quando muitas pessoas ficam a menos de distancia_maxima umas
+        das outras (mais pares candidatos por centro).
+
+        Limitações: pessoas que aparecem ou somem dentro de uma zona (borda da
+        imagem, oclusão longa) não contam entrada/saída, e duas pessoas que se
+        cruzam a menos de distancia_maxima podem trocar de trilha.
+
+        Args:
+            mapa_zonas: MapaZonas com as zonas da câmera
+            distancia_maxima: Deslocamento máximo (px) entre frames para
+                              associar um centro a uma trilha (padrão: 5% da
+                              largura do frame)
+            frames_confirmacao: Frames seguidos na nova zona para contar a troca
+            frames_perdido: Frames sem detecção antes de descartar a trilha
+        """
+        self.mapa_zonas = mapa_zonas
+        self.distancia_maxima = distancia_maxima
+        self.frames_confirmacao = frames_confirmacao
+        self.frames_perdido = frames_perdido
+
+        n = len(mapa_zonas)
+        self.contagens = np.zeros(n, dtype=np.int64)
+        self.entradas = np.zeros(n, dtype=np.int64)
+        self.saidas = np.zeros(n, dtype=np.int64)
+        self._limpar_trilhas()
+
+    def _limpar_trilhas(self):
+        """Descarta todas as trilhas"""
+        # Estado de cada trilha (zona -1 = fora das zonas)
+        self.posicoes = np.empty((0, 2), dtype=np.float64)
+        self.zona_confirmada = np.empty(0, dtype=np.int64)
+        self.zona_candidata = np.empty(0, dtype=np.int64)
+        self.frames_candidata = np.empty(0, dtype=np.int64)
+        self.frames_sem_ver = np.empty(0, dtype=np.int64)
+
+    def pares_candidatos(self, centros, limite):
+        """
+        Pares (trilha, centro) a até limite px, buscados em uma grade de
+        células de lado limite: cada centro só é comparado com as trilhas
+        das 9 células vizinhas, e não com todas as trilhas
+
+        Returns:
+            Tupla (trilhas, indices, distancias) com um elemento por par
+        """
+        celula_trilha = np.floor(self.posicoes / limite).astype(np.int64)
+        celula_centro = np.floor(centros / limite).astype(np.int64)
+        chaves = celula_trilha[:, 0] * CHAVE_COLUNA + celula_trilha[:, 1]
+        ordem = np.argsort(chaves, kind='stable')
+        chaves = chaves[ordem]
+
+        trilhas, indices = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                vizinha = (celula_centro[:, 0] + dx) * CHAVE_COLUNA + celula_centro[:, 1] + dy
+                inicio = np.searchsorted(chaves, vizinha, side='left')
+                quantidade = np.searchsorted(chaves, vizinha, side='right') - inicio
+                # Expande cada faixa [inicio, inicio + quantidade) sem laço
+                deslocamento = np.arange(quantidade.sum()) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+                trilhas.append(ordem[np.repeat(inicio, quantidade) + deslocamento])
+                indices.append(np.repeat(np.arange(len(centros)), quantidade))
+
+        trilhas = np.concatenate(trilhas)
+        indices = np.concatenate(indices)
+        distancias = np.linalg.norm(self.posicoes[trilhas] - centros[indices], axis=1)
+        perto = distancias <= limite
+        return trilhas[perto], indices[perto], distancias[perto]
+
+    def associar(self, centros, limite):
+        """
+        Associa os centros às trilhas pelo vizinho mais próximo (guloso)
+
+        Equivale a aceitar os pares em ordem crescente de distância: a cada
+        rodada são aceitos de uma vez todos os pares em que trilha e centro
+        são o mais próximo um do outro (no mínimo o par mais próximo de todos)
+
+        Returns:
+            Array (N,) com o índice da trilha de cada centro (-1 = nova trilha)
+        """
+        trilha_do_centro = np.full(len(centros), -1, dtype=np.int64)
+        if len(centros) == 0 or len(self.posicoes) == 0:
+            return trilha_do_centro
+
+        trilhas, indices, distancias = self.pares_candidatos(centros, limite)
+        ordem = np.argsort(distancias, kind='stable')
+        trilhas, indices = trilhas[ordem], indices[ordem]
+
+        while len(trilhas):
+            # Primeira ocorrência = par mais próximo de cada trilha / de cada centro
+            melhor_trilha = np.zeros(len(trilhas), dtype=bool)
+            melhor_trilha[np.unique(trilhas, return_index=True)[1]] = True
+            melhor_centro = np.zeros(len(trilhas), dtype=bool)
+            melhor_centro[np.unique(indices, return_index=True)[1]] = True
+            aceitos = melhor_trilha & melhor_centro
+            trilha_do_centro[indices[aceitos]] = trilhas[aceitos]
+
+            trilha_usada = np.zeros(len(self.posicoes), dtype=bool)
+            trilha_usada[trilhas[aceitos]] = True
+            restantes = ~trilha_usada[trilhas] & (trilha_do_centro[indices] < 0)
+            trilhas, indices = trilhas[restantes], indices[restantes]
+        return trilha_do_centro
+
+    def atualizar(self, centros, largura, altura):
+        """
+        Atualiza as contagens e as trilhas com os centros do frame
+
+        Returns:
+            Array com a contagem atual de cada zona
+        """
+        centros = np.asarray(centros, dtype=np.float64).reshape(-1, 2)
+        rotulos = self.mapa_zonas.classificar(centros, largura, altura)
+        self.contagens = np.bincount(rotulos + 1, minlength=len(self.mapa_zonas) + 1)[1:]
+
+        limite = self.distancia_maxima or 0.05 * largura
+        trilha_do_centro = self.associar(centros, limite)
+
+        # Trilhas não vistas neste frame envelhecem (e são descartadas depois)
+        vistas = np.zeros(len(self.posicoes), dtype=bool)
+        vistas[trilha_do_centro[trilha_do_centro >= 0]] = True
+        self.frames_sem_ver[~vistas] += 1
+
+        associados = trilha_do_centro >= 0
+        self._atualizar_trilhas(trilha_do_centro[associados], centros[associados], rotulos[associados])
+
+        # Centros sem trilha iniciam trilhas novas (zona aceita sem contar entrada)
+        novos = trilha_do_centro < 0
+        self.posicoes = np.concatenate([self.posicoes, centros[novos]])
+        self.zona_confirmada = np.concatenate([self.zona_confirmada, rotulos[novos]])
+        self.zona_candidata = np.concatenate([self.zona_candidata, rotulos[novos]])
+        self.frames_candidata = np.concatenate([self.frames_candidata, np.zeros(novos.sum(), dtype=np.int64)])
+        self.frames_sem_ver = np.concatenate([self.frames_sem_ver, np.zeros(novos.sum(), dtype=np.int64)])
+
+        ativas = self.frames_sem_ver <= self.frames_perdido
+        self.posicoes = self.posicoes[ativas]
+        self.zona_confirmada = self.zona_confirmada[ativas]
+        self.zona_candidata = self.zona_candidata[ativas]
+        self.frames_candidata = self.frames_candidata[ativas]
+        self.frames_sem_ver = self.frames_sem_ver[ativas]
+
+        return self.contagens
+
+    def _atualizar_trilhas(self, trilhas, posicoes, zonas):
+        """
+        Move as trilhas (índices distintos) e confirma a troca de zona
+        depois de frames_confirmacao frames
+        """
+        self.posicoes[trilhas] = posicoes
+        self.frames_sem_ver[trilhas] = 0
+
+        # Na zona confirmada: zera o candidato; zona nova: recomeça a contagem
+        na_confirmada = zonas == self.zona_confirmada[trilhas]
+        nova = ~na_confirmada & (zonas != self.zona_candidata[trilhas])
+        frames = np.where(nova, 1, self.frames_candidata[trilhas] + 1)
+        frames[na_confirmada] = 0
+        self.zona_candidata[trilhas] = zonas
+
+        confirmadas = ~na_confirmada & (frames >= self.frames_confirmacao)
+        anteriores = self.zona_confirmada[trilhas[confirmadas]]
+        novas = zonas[confirmadas]
+        np.add.at(self.saidas, anteriores[anteriores >= 0], 1)
+        np.add.at(self.entradas, novas[novas >= 0], 1)
+        self.zona_confirmada[trilhas[confirmadas]] = novas
+        frames[confirmadas] = 0
+        self.frames_candidata[trilhas] = frames
+
+    def resetar(self):
+        """Zera os contadores de entrada/saída e as trilhas"""
+        self.entradas[:] = 0
+        self.saidas[:] = 0
+        self._limpar_trilhas()
+
+    def resumo(self):
+        """Lista de dicionários (nome, contagem, entradas, saídas) por zona"""
+        return [
+            {'nome': nome, 'contagem': int(c), 'entradas': int(e), 'saidas': int(s)}
+            for nome, c, e, s in zip(self.mapa_zonas.nomes, self.contagens, self.entradas, self.saidas)
+        ]
+
+    def desenhar(self, frame):
+        """Desenha o contorno de cada zona com a contagem e os contadores"""
+        altura, largura = frame.shape[:2]
+        for i in range(len(self.mapa_zonas)):
+            pixels = self.mapa_zonas.pontos_pixels(i, largura, altura)
+            cv2.polylines(frame, [pixels], True, (255, 128, 0), 2)
+
+            x, y = pixels.min(axis=0)
+            texto = (f"{self.mapa_zonas.nomes[i]}: {self.contagens[i]} "
+                     f"(+{self.entradas[i]} / -{self.saidas[i]})")
+            cv2.putText(frame, texto, (int(x) + 5, int(y) + 20),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 128, 0), 2)